@@ -22,6 +22,7 @@ limitations under the License.
 """
 import os
 import weakref
+from copy import copy
 from tempfile import mkstemp
 
 from goose3.configuration import ArticleContextPattern, Configuration, PublishDatePattern  # noqa: F401
@@ -30,6 +31,7 @@ from goose3.image import Image  # noqa: F401 - to make it available for document
 from goose3.video import Video  # noqa: F401 - to make it available for documentation!
 from goose3.crawler import (CrawlCandidate, Crawler)
 from goose3.network import NetworkFetcher
+from goose3.text import get_encoding_from_headers
 
 
 class Goose(object):
@@ -100,16 +102,35 @@ class Goose(object):
             self.shutdown_network()
         self.finalizer.atexit = False  # turn off the garbage collection close
 
-    def extract(self, url=None, raw_html=None):
+    def extract(self, url=None, raw_html=None, raw_bytes=None, headers=None, doc=None):
         ''' Extract the most likely article content from the html page
 
             Args:
                 url (str): URL to pull and parse
                 raw_html (str): String representation of the HTML page
+                raw_bytes (bytes): Raw bytes of the HTML page, decoded once \
+                by the parser
+                headers (dict): HTTP headers of the page; the charset of the \
+                `Content-Type` header is used to decode `raw_bytes`
+                doc (lxml.html.HtmlElement): Already parsed HTML page; when \
+                given, `url` is only used as the final URL of the article
             Returns:
                 Article: Representation of the article contents \
-                including other parsed and extracted metadata '''
-        crawl_candidate = CrawlCandidate(self.config, url, raw_html)
+                including other parsed and extracted metadata
+            Note:
+                `doc` is used as is and is modified in place while the \
+                article is cleaned; pass a copy (`copy.deepcopy(doc)`) if \
+                the tree is needed afterwards. No copy is taken unless image \
+                fetching is enabled. '''
+        if doc is not None:
+            if hasattr(doc, 'getroot'):
+                doc = doc.getroot()
+            crawl_candidate = CrawlCandidate(self.config, url, None, doc=doc)
+        elif raw_bytes is not None:
+            crawl_candidate = CrawlCandidate(self.config, url, raw_bytes,
+                                             encoding=get_encoding_from_headers(headers))
+        else:
+            crawl_candidate = CrawlCandidate(self.config, url, raw_html)
         return self.__crawl(crawl_candidate)
 
     def shutdown_network(self):
@@ -121,20 +142,30 @@ class Goose(object):
         self.fetcher = None
 
     def __crawl(self, crawl_candidate):
-        ''' wrap the crawling functionality '''
-        def crawler_wrapper(parser, parsers_lst, crawl_candidate):
+        ''' wrap the crawling functionality; if the page cannot be handled
+            it is parsed again with the next available parser, reusing the
+            html that was already fetched '''
+        config = self.config
+        tried = []
+        while True:
+            tried.append(config.get_parser())
             try:
-                crawler = Crawler(self.config, self.fetcher)
-                article = crawler.crawl(crawl_candidate)
-            except (UnicodeDecodeError, ValueError) as ex:
-                if parsers_lst:
-                    parser = parsers_lst.pop(0)  # remove it also!
-                    return crawler_wrapper(parser, parsers_lst, crawl_candidate)
-                else:
-                    raise ex
-            return article
-
-        # use the wrapper
-        parsers = list(self.config.available_parsers)
-        parsers.remove(self.config.parser_class)
-        return crawler_wrapper(self.config.parser_class, parsers, crawl_candidate)
+                crawler = Crawler(config, self.fetcher)
+                return crawler.crawl(crawl_candidate)
+            except (UnicodeDecodeError, ValueError):
+                # a pre-parsed document cannot be parsed again
+                if crawl_candidate.doc is not None:
+                    raise
+                config = self.__fallback_config(tried)
+                if config is None:
+                    raise
+
+    def __fallback_config(self, tried):
+        ''' a copy of the configuration using the first available parser
+            that was not tried yet, None if there is none left '''
+        for parser in self.config.available_parsers:
+            config = copy(self.config)
+            config.parser_class = parser
+            if config.get_parser() not in tried:
+                return config
+        return None
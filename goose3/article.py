@@ -48,9 +48,12 @@ class Article(object):
         self._schema = None
         self._doc = None
         self._raw_doc = None
+        self._raw_doc_loader = None
         self._publish_date = None
         self._publish_datetime_utc = None
         self._additional_data = {}
+        # scores given to the nodes while looking for the top node
+        self._node_scores = {}
 
         # all meta informations
         self.metatags = {}
@@ -265,7 +268,14 @@ class Article(object):
         ''' etree: Original, uncleaned, and untouched lxml document to be processed
 
             Note:
-                Read only '''
+                Read only
+            Note:
+                Unless image fetching is enabled, the document is parsed \
+                again from `raw_html` the first time it is accessed; it is \
+                `None` if the article was extracted from a parsed document '''
+        if self._raw_doc is None and self._raw_doc_loader is not None:
+            self._raw_doc = self._raw_doc_loader()
+            self._raw_doc_loader = None
         return self._raw_doc
 
     @property
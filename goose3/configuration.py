@@ -21,20 +21,45 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import os
+import re
 import tempfile
 
 from goose3.text import StopWords
 from goose3.parsers import Parser, ParserSoup, ParserXML
+from goose3.cleaners import DocumentCleaner, StandardDocumentCleaner
+from goose3.extractors.content import ContentExtractor, StandardContentExtractor
+from goose3.outputformatters import OutputFormatter, StandardOutputFormatter
+from goose3.resolvers import DEFAULT_DOMAIN_RESOLVERS
 from goose3.version import __version__
 
 AVAILABLE_PARSERS = {
     'lxml': Parser,
     'html': Parser,
-    'lxml': ParserXML,
+    'xml': ParserXML,
     'soup': ParserSoup,
 }
 
 
+def register_parser(name, parser):
+    ''' Make a parser available to the `parser_class` configuration under
+        the given name; a parser registered under an existing name replaces
+        it
+
+        Args:
+            name (str): The key to select the parser with
+            parser (Parser): A subclass of `goose3.parsers.Parser`
+        Raises:
+            ValueError: If the parser is not a subclass of `Parser` '''
+    if not isinstance(parser, type) or not issubclass(parser, Parser):
+        raise ValueError('parser must be a subclass of goose3.parsers.Parser: {}'.format(parser))
+    AVAILABLE_PARSERS[name] = parser
+
+
+HTTP_ARCHIVE_MODES = (None, 'record', 'replay')
+
+SCORING_BACKENDS = ('python', 'numpy')
+
+
 class ArticleContextPattern(object):
     ''' Help ensure correctly generated article context patterns
 
@@ -81,6 +106,137 @@ KNOWN_ARTICLE_CONTENT_PATTERNS = [
 ]
 
 
+BACK_REFERENCE = re.compile(r'\\\d|\(\?P=')
+
+
+class CompiledContextPatterns(object):
+    ''' The article context patterns that apply to one domain, compiled into
+        a single XPath selecting the candidate nodes and one regular
+        expression per attribute; the nodes are still returned pattern by
+        pattern, in the order of the patterns
+
+        Args:
+            patterns (list): The `ArticleContextPattern` to compile, in order '''
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.selectors = []
+        self.xpaths = []
+        self.body_tags = set()
+        self.body_attributes = {}
+
+        # same selection as Parser.getElementsByTag, without calling back
+        # into python for each node and pattern: the candidates have one of
+        # the attributes or tags, the values are matched afterwards
+        predicates = set()
+        values = {}
+        for position, pattern in enumerate(patterns):
+            if pattern.xpath:
+                self.xpaths.append((position, pattern.xpath))
+            else:
+                regexp = None
+                if pattern.attr and pattern.value:
+                    regexp = re.compile(pattern.value, re.IGNORECASE)
+                    values.setdefault(pattern.attr, []).append(pattern.value)
+                if pattern.attr and not (regexp is not None and regexp.search('')):
+                    predicates.add('@%s' % pattern.attr)
+                elif pattern.tag:
+                    predicates.add('self::%s' % pattern.tag)
+                else:
+                    predicates.add('true()')
+                self.selectors.append((position, pattern.tag, pattern.attr, regexp))
+
+            if pattern.attr:
+                self.body_attributes.setdefault(pattern.attr, set()).add(pattern.value)
+            if pattern.tag:
+                self.body_tags.add(pattern.tag)
+
+        self.selector = None
+        if predicates:
+            self.selector = 'descendant-or-self::*[%s]' % ' or '.join(sorted(predicates))
+
+        # any of the values of an attribute, to skip most candidates at once;
+        # back references would point to other groups once combined
+        self.prefilters = {}
+        for attr, attr_values in values.items():
+            if any(BACK_REFERENCE.search(value) for value in attr_values):
+                continue
+            try:
+                self.prefilters[attr] = re.compile('|'.join('(?:%s)' % value for value in attr_values), re.IGNORECASE)
+            except re.error:
+                pass
+
+    def find(self, parser, doc):
+        ''' Find the nodes of the document matching the patterns
+
+            Args:
+                parser (Parser): The parser of the document
+                doc (Element): The document to search
+            Returns:
+                list: The nodes matching the first pattern, then the second... '''
+        matches = [[] for _ in self.patterns]
+        if self.selector:
+            for node in parser.getElementsByXPath(doc, self.selector):
+                skipped = set()
+                for attr, prefilter in self.prefilters.items():
+                    if not prefilter.search(parser.getAttribute(node, attr) or ''):
+                        skipped.add(attr)
+                for position, tag, attr, regexp in self.selectors:
+                    if tag and (node is doc or node.tag != tag):
+                        continue
+                    if regexp is not None:
+                        if attr in skipped or not regexp.search(parser.getAttribute(node, attr) or ''):
+                            continue
+                    elif attr and parser.getAttribute(node, attr) is None:
+                        continue
+                    matches[position].append(node)
+        for position, xpath in self.xpaths:
+            matches[position] = parser.getElementsByXPath(doc, xpath)
+        return [node for nodes in matches for node in nodes]
+
+    def is_articlebody(self, parser, node):
+        ''' Check if the node has the tag or the exact attribute value of
+            one of the patterns '''
+        for attr, values in self.body_attributes.items():
+            if parser.getAttribute(node, attr) in values:
+                return True
+        return node.tag in self.body_tags
+
+
+class ArticleContextPatternIndex(object):
+    ''' The article context patterns indexed by domain; the patterns that
+        apply to a domain are compiled once and shared by all the domains
+        without patterns of their own
+
+        Args:
+            patterns (list): The `ArticleContextPattern` to index, in order '''
+
+    def __init__(self, patterns):
+        self._generic = []
+        self._by_domain = {}
+        for position, pattern in enumerate(patterns):
+            if pattern.domain:
+                self._by_domain.setdefault(pattern.domain, []).append((position, pattern))
+            else:
+                self._generic.append((position, pattern))
+        self._compiled = {}
+
+    def get(self, domain):
+        ''' Retrieve the compiled patterns that apply to the domain
+
+            Args:
+                domain (str): The domain of the article
+            Returns:
+                CompiledContextPatterns: The generic and the domain patterns '''
+        key = domain if domain in self._by_domain else None
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            patterns = sorted(self._generic + self._by_domain.get(key, []), key=lambda item: item[0])
+            compiled = CompiledContextPatterns([pattern for _, pattern in patterns])
+            self._compiled[key] = compiled
+        return compiled
+
+
 class PublishDatePattern(object):
     ''' Ensure correctly formed publish date patterns; to be used in conjuntion
         with the configuration `known_publish_date_tags` property
@@ -188,7 +344,6 @@ class Configuration(object):
 
     def __init__(self):
         # parser information
-        self._available_parsers = list(AVAILABLE_PARSERS.keys())
         self._parser_class = 'html'
 
         # URL extraction parameters
@@ -197,12 +352,21 @@ class Configuration(object):
         self._http_auth = None
         self._http_proxies = None
         self._http_headers = None
+        self._http_archive_path = None
+        self._http_archive_mode = None
+        self._stream_parsing = False
+        self._bytes_first = False
+        self._strip_scripts = False
+        self._lightweight_variants = False
+        self._print_variant_patterns = []
 
         # extraction information
         self._local_storage_path = os.path.join(tempfile.gettempdir(), 'goose')
         self._known_context_patterns = KNOWN_ARTICLE_CONTENT_PATTERNS[:]
+        self._context_pattern_index = None
         self._known_publish_date_tags = KNOWN_PUBLISH_DATE_TAGS[:]
         self._known_author_patterns = KNOWN_AUTHOR_PATTERNS[:]
+        self._domain_resolvers = DEFAULT_DOMAIN_RESOLVERS[:]
         self._target_language = 'en'
         self._use_meta_language = True
 
@@ -210,6 +374,11 @@ class Configuration(object):
         self._strict = True
         self._debug = False
         self._stopwords_class = StopWords
+        self._scoring_backend = 'python'
+        self._max_candidate_nodes = None
+        self._extractor_class = StandardContentExtractor
+        self._cleaner_class = StandardDocumentCleaner
+        self._formatter_class = StandardOutputFormatter
 
         # imagemagick executable paths
         self._imagemagick_convert_path = "/opt/local/bin/convert"  # Not used
@@ -364,6 +533,22 @@ class Configuration(object):
         else:
             raise Exception("Unknown type: {}. Use an AuthorPattern.".format(type(val)))
 
+    @property
+    def domain_resolvers(self):
+        ''' list(DomainResolver): The resolvers used to follow a fetched page \
+            to the page holding the actual article, e.g. a tweet to the \
+            article it links to
+
+            Note:
+                Defaults to the twitter and facebook resolvers; set to an \
+                empty list to turn domain resolution off '''
+        return self._domain_resolvers
+
+    @domain_resolvers.setter
+    def domain_resolvers(self, val):
+        ''' set the domain_resolvers property '''
+        self._domain_resolvers = list(val) if val else []
+
     @property
     def strict(self):
         ''' bool: Enable `strict mode` and throw exceptions instead of
@@ -422,10 +607,10 @@ class Configuration(object):
 
     @property
     def parser_class(self):
-        ''' str: The key of the parser to use
+        ''' str: The key of the parser to use, one of the `available_parsers`
 
             Note:
-                Defaults to `lxml` '''
+                Defaults to `html` '''
         return self._parser_class
 
     @parser_class.setter
@@ -438,8 +623,9 @@ class Configuration(object):
         ''' list(str): A list of all possible parser values for the parser_class
 
             Note:
-                Not settable '''
-        return self._available_parsers
+                Not settable; use `goose3.configuration.register_parser` to \
+                add a parser '''
+        return list(AVAILABLE_PARSERS.keys())
 
     @property
     def http_auth(self):
@@ -484,6 +670,37 @@ class Configuration(object):
         ''' set the http_headers property '''
         self._http_headers = val
 
+    @property
+    def http_archive_path(self):
+        ''' str: Path of the archive file used to record or replay the HTTP
+            exchanges, pages and images alike
+
+            Note:
+                Defaults to `None`; required when `http_archive_mode` is set '''
+        return self._http_archive_path
+
+    @http_archive_path.setter
+    def http_archive_path(self, val):
+        ''' set the http_archive_path property '''
+        self._http_archive_path = val
+
+    @property
+    def http_archive_mode(self):
+        ''' str: Use `record` to store every HTTP exchange in the
+            `http_archive_path` file or `replay` to answer every request from
+            that file without using the network
+
+            Note:
+                Defaults to `None` (no archive) '''
+        return self._http_archive_mode
+
+    @http_archive_mode.setter
+    def http_archive_mode(self, val):
+        ''' set the http_archive_mode property '''
+        if val not in HTTP_ARCHIVE_MODES:
+            raise ValueError("Unknown http archive mode: {}. Use one of {}".format(val, HTTP_ARCHIVE_MODES))
+        self._http_archive_mode = val
+
     @property
     def browser_user_agent(self):
         ''' Browser user agent string to use when making URL requests
@@ -585,6 +802,176 @@ class Configuration(object):
         ''' set the use_meta_language property '''
         self._use_meta_language = bool(val)
 
+    @property
+    def stream_parsing(self):
+        ''' bool: Build the document tree while the page is being downloaded
+            instead of waiting for the full body; only applies to fetched urls
+
+            Note:
+                Defaults to `False` '''
+        return self._stream_parsing
+
+    @stream_parsing.setter
+    def stream_parsing(self, val):
+        ''' set the stream_parsing property '''
+        self._stream_parsing = bool(val)
+
+    @property
+    def bytes_first(self):
+        ''' bool: Hand the raw bytes of fetched pages along with the charset
+            of the HTTP headers straight to the parser so that each page is
+            decoded only once; `Article.raw_html` then holds the raw bytes
+
+            Note:
+                Defaults to `False` '''
+        return self._bytes_first
+
+    @bytes_first.setter
+    def bytes_first(self, val):
+        ''' set the bytes_first property '''
+        self._bytes_first = bool(val)
+
+    @property
+    def strip_scripts(self):
+        ''' bool: Drop comments and the `<script>`, `<style>`, `<noscript>`
+            and `<svg>` elements from the html before it is parsed instead
+            of removing them from the document afterwards; json-ld scripts
+            are kept. Not applied with `stream_parsing`
+
+            Note:
+                Defaults to `False`; `Article.raw_doc` is then built from the
+                stripped html as well '''
+        return self._strip_scripts
+
+    @strip_scripts.setter
+    def strip_scripts(self, val):
+        ''' set the strip_scripts property '''
+        self._strip_scripts = bool(val)
+
+    @property
+    def scoring_backend(self):
+        ''' str: Use `numpy` to compute the boosts of the candidate nodes and
+            propagate their scores to the ancestors on numpy arrays, which
+            picks the same top node as the default `python` scoring; the
+            statistics of each node are still computed in python, so it is
+            only marginally faster
+
+            Note:
+                Defaults to `python`; `numpy` is an optional dependency and
+                the `python` scoring is used when it is not installed '''
+        return self._scoring_backend
+
+    @scoring_backend.setter
+    def scoring_backend(self, val):
+        ''' set the scoring_backend property '''
+        if val not in SCORING_BACKENDS:
+            raise ValueError("Unknown scoring backend: {}. Use one of {}".format(val, SCORING_BACKENDS))
+        self._scoring_backend = val
+
+    @property
+    def max_candidate_nodes(self):
+        ''' int: The maximum number of paragraphs, pre and td nodes scored to
+            find the article content; on larger pages only the nodes with the
+            longest text are scored, which bounds the time spent on pages with
+            tens of thousands of table cells
+
+            Note:
+                Defaults to `None` (no limit) '''
+        return self._max_candidate_nodes
+
+    @max_candidate_nodes.setter
+    def max_candidate_nodes(self, val):
+        ''' set the max_candidate_nodes property '''
+        self._max_candidate_nodes = int(val) if val else None
+
+    @property
+    def extractor_class(self):
+        ''' ContentExtractor: The class that looks for and scores the top
+            node of the article; it is built with the configuration and the
+            article being extracted
+
+            Note:
+                Defaults to `goose3.extractors.content.StandardContentExtractor`; \
+                must be a subclass of `goose3.extractors.content.ContentExtractor` '''
+        return self._extractor_class
+
+    @extractor_class.setter
+    def extractor_class(self, val):
+        ''' set the extractor_class property '''
+        if not isinstance(val, type) or not issubclass(val, ContentExtractor):
+            msg = 'extractor_class must be a subclass of goose3.extractors.content.ContentExtractor: {}'
+            raise ValueError(msg.format(val))
+        self._extractor_class = val
+
+    @property
+    def cleaner_class(self):
+        ''' DocumentCleaner: The class that cleans the document before it is
+            scored; it is built with the configuration and the article being
+            extracted
+
+            Note:
+                Defaults to `goose3.cleaners.StandardDocumentCleaner`; must be a subclass of \
+                `goose3.cleaners.DocumentCleaner` '''
+        return self._cleaner_class
+
+    @cleaner_class.setter
+    def cleaner_class(self, val):
+        ''' set the cleaner_class property '''
+        if not isinstance(val, type) or not issubclass(val, DocumentCleaner):
+            raise ValueError('cleaner_class must be a subclass of goose3.cleaners.DocumentCleaner: {}'.format(val))
+        self._cleaner_class = val
+
+    @property
+    def formatter_class(self):
+        ''' OutputFormatter: The class that turns the top node into the
+            cleaned text; it is built with the configuration and the article
+            being extracted
+
+            Note:
+                Defaults to `goose3.outputformatters.StandardOutputFormatter`; must be a subclass of \
+                `goose3.outputformatters.OutputFormatter` '''
+        return self._formatter_class
+
+    @formatter_class.setter
+    def formatter_class(self, val):
+        ''' set the formatter_class property '''
+        if not isinstance(val, type) or not issubclass(val, OutputFormatter):
+            msg = 'formatter_class must be a subclass of goose3.outputformatters.OutputFormatter: {}'
+            raise ValueError(msg.format(val))
+        self._formatter_class = val
+
+    @property
+    def lightweight_variants(self):
+        ''' bool: Extract fetched pages from their lightweight variant, the
+            `<link rel="amphtml">` of the page head or the url built from the
+            `print_variant_patterns`, falling back to the full page when that
+            variant yields no text
+
+            Note:
+                Defaults to `False` '''
+        return self._lightweight_variants
+
+    @lightweight_variants.setter
+    def lightweight_variants(self, val):
+        ''' set the lightweight_variants property '''
+        self._lightweight_variants = bool(val)
+
+    @property
+    def print_variant_patterns(self):
+        ''' list(tuple): Regular expression and replacement pairs used to
+            build the print variant url from the page url, e.g. \
+            `(r'^(https?://www\\.example\\.com/.*)$', r'\\1?print=1')`; the first \
+            pattern that matches is used
+
+            Note:
+                Defaults to an empty list; only used with `lightweight_variants` '''
+        return self._print_variant_patterns
+
+    @print_variant_patterns.setter
+    def print_variant_patterns(self, val):
+        ''' set the print_variant_patterns property '''
+        self._print_variant_patterns = list(val) if val else []
+
     @property
     def enable_image_fetching(self):
         ''' bool: Turn on or off image extraction
@@ -655,3 +1042,18 @@ class Configuration(object):
             Returns:
                 Parser: The parser to use '''
         return AVAILABLE_PARSERS[self.parser_class]
+
+    def get_context_patterns(self, domain):
+        ''' Retrieve the compiled `known_context_patterns` that apply to the
+            domain; the index is rebuilt when the patterns change
+
+            Args:
+                domain (str): The domain of the article
+            Returns:
+                CompiledContextPatterns: The patterns to look for '''
+        patterns = self._known_context_patterns
+        index = self._context_pattern_index
+        if index is None or index[0] is not patterns or index[1] != len(patterns):
+            index = (patterns, len(patterns), ArticleContextPatternIndex(patterns))
+            self._context_pattern_index = index
+        return index[2].get(domain)
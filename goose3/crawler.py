@@ -24,17 +24,19 @@ import os
 import re
 import glob
 from copy import deepcopy
-import urllib
+from functools import partial
 import json
+from urllib.parse import urljoin
 
 import dateutil.parser
 from dateutil.tz import tzutc
+from requests import RequestException
 
 from goose3.article import Article
 from goose3.sub_article import SubArticle
 from goose3.utils import URLHelper, RawHelper
-from goose3.text import get_encodings_from_content
-from goose3.extractors.content import StandardContentExtractor
+from goose3.text import (get_encodings_from_content, get_encoding_from_headers, get_amphtml_link,
+                         strip_scripts_styles)
 from goose3.extractors.videos import VideoExtractor
 from goose3.extractors.title import TitleExtractor
 from goose3.extractors.images import ImageExtractor
@@ -48,20 +50,36 @@ from goose3.extractors.schema import SchemaExtractor
 from goose3.extractors.metas import MetasExtractor
 from goose3.extractors.microdata import MicroDataExtractor
 from goose3.extractors.hcard import HCardExtractor
-from goose3.cleaners import StandardDocumentCleaner
-from goose3.outputformatters import StandardOutputFormatter
 
 from goose3.network import NetworkFetcher
 import goose3.text
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def parse_document(parser, raw_html, encoding=None, strip_scripts=False):
+    ''' parse the raw html, str or bytes, with the parser class; kept apart
+        from the crawler so that the raw document can be parsed again later
+        without holding on to the crawler '''
+    if strip_scripts:
+        raw_html = strip_scripts_styles(raw_html)
+    if isinstance(raw_html, bytes):
+        return parser.frombytes(raw_html, encoding)
+    return parser.fromstring(raw_html, encoding)
+
+
 class CrawlCandidate(object):
-    def __init__(self, config, url, raw_html, doc=None):
+    def __init__(self, config, url, raw_html, doc=None, encoding=None):
         self.config = config
         # parser
         self.parser = self.config.get_parser()
         self.url = url
+        # either the decoded html or the raw bytes of the page
         self.raw_html = raw_html
         self.doc = doc
+        # encoding of the raw bytes, if known; for decoded html, the charset
+        # sniffed from the raw bytes before decoding them
+        self.encoding = encoding
 
 
 class Crawler(object):
@@ -137,8 +155,29 @@ class Crawler(object):
         parse_candidate = self.get_parse_candidate(crawl_candidate)
         doc = None
         if crawl_candidate.doc is None:
+            fetched = not crawl_candidate.raw_html
+
+            if fetched and self.config.lightweight_variants:
+                article = self.crawl_variant(self.get_print_variant_url(parse_candidate.url), crawl_sub)
+                if article is not None:
+                    return article
+
             # raw html
-            raw_html = self.get_html(crawl_candidate, parse_candidate)
+            if fetched and self.config.stream_parsing:
+                doc = self.get_streamed_document(crawl_candidate, parse_candidate)
+                raw_html = crawl_candidate.raw_html
+            else:
+                raw_html = self.get_html(crawl_candidate, parse_candidate)
+
+            if fetched:
+                doc = self.resolve_domain(crawl_candidate, parse_candidate, doc)
+                raw_html = crawl_candidate.raw_html
+
+            if fetched and raw_html and self.config.lightweight_variants:
+                article = self.crawl_variant(
+                    self.get_amphtml_variant_url(raw_html, parse_candidate.url), crawl_sub)
+                if article is not None:
+                    return article
 
             if raw_html is None:
                 return self.article
@@ -146,13 +185,14 @@ class Crawler(object):
             doc = crawl_candidate.doc
             raw_html = None
         return self.process(
-            raw_html, parse_candidate.url, parse_candidate.link_hash, doc, crawl_sub)
+            raw_html, parse_candidate.url, parse_candidate.link_hash, doc, crawl_sub,
+            encoding=crawl_candidate.encoding)
 
-    def process(self, raw_html, final_url, link_hash, doc=None, crawl_sub=False):
+    def process(self, raw_html, final_url, link_hash, doc=None, crawl_sub=False, encoding=None):
 
         # create document
         if doc is None:
-            doc = self.get_document(raw_html)
+            doc = self.get_document(raw_html, encoding)
 
         # article
         self.article._final_url = final_url
@@ -160,7 +200,13 @@ class Crawler(object):
         self.article._link_hash = link_hash
         self.article._raw_html = raw_html
         self.article.doc = doc
-        self.article._raw_doc = deepcopy(doc)
+        if self.config.enable_image_fetching:
+            # the image extraction works on the original document
+            self.article._raw_doc = deepcopy(doc)
+        elif raw_html is not None:
+            # no copy on the hot path; raw_doc is parsed again if needed
+            self.article._raw_doc_loader = partial(parse_document, self.parser, raw_html, encoding,
+                                                   self.config.strip_scripts)
 
         # open graph
         self.article._opengraph = self.opengraph_extractor.extract()
@@ -177,8 +223,8 @@ class Crawler(object):
             elif self.article.schema and "url" in self.article.schema:
                 self.article._final_url = self.article.schema["url"]
 
-        # meta
-        metas = self.metas_extractor.extract()
+        # meta; the encoding of decoded html is the charset already sniffed
+        metas = self.metas_extractor.extract(encoding if isinstance(raw_html, str) else None)
         # print(metas)
         self.article._meta_lang = metas['lang']
         self.article._meta_favicon = metas['favicon']
@@ -255,43 +301,48 @@ class Crawler(object):
         else:
             doc_nodes = [self.cleaner.clean(deepcopy(x)) for x in doc]
 
-        # big stuff
-        self.article._top_node = self.extractor.calculate_best_node(doc_nodes)
+        # the text of the nodes is built once while the top node is looked
+        # for and cleaned up; the formatter rewrites it afterwards
+        with self.parser.text_cache():
+            # big stuff
+            self.article._top_node = self.extractor.calculate_best_node(doc_nodes)
 
-        # if we do not find an article within the discovered possible article nodes,
-        # try again with the root node.
-        if self.article._top_node is None:
+            # if we do not find an article within the discovered possible article nodes,
             # try again with the root node.
-            self.article._top_node = self.extractor.calculate_best_node(self.article._doc)
-            if self.article.top_node is None:
-                self.article._top_node = self.article.doc
-        else:
-            # set the doc member to the discovered article node.
-            # self.article._doc = doc
-            self.article.doc = doc[0] if isinstance(doc, list) else doc
+            if self.article._top_node is None:
+                # try again with the root node; its candidate nodes are
+                # reused when it is the document that was just checked
+                self.article._top_node = self.extractor.calculate_best_node([self.article._doc])
+                if self.article.top_node is None:
+                    self.article._top_node = self.article.doc
+            else:
+                # set the doc member to the discovered article node.
+                # self.article._doc = doc
+                self.article.doc = doc[0] if isinstance(doc, list) else doc
 
-        # if we have a top node
-        # let's process it
-        if self.article._top_node is not None:
+            # if we have a top node
+            # let's process it
+            if self.article._top_node is not None:
 
-            # article links
-            self.article._links = self.links_extractor.extract()
-            self.article.html_links = self.links_extractor.extract_html_links()
+                # article links
+                self.article._links = self.links_extractor.extract()
+                self.article.html_links = self.links_extractor.extract_html_links()
 
-            # tweets
-            self.article._tweets = self.tweets_extractor.extract()
+                # tweets
+                self.article._tweets = self.tweets_extractor.extract()
 
-            # video handling
-            self.article._movies = self.video_extractor.get_videos()
+                # video handling
+                self.article._movies = self.video_extractor.get_videos()
 
-            # image handling
-            if self.config.enable_image_fetching:
-                self.get_image()
+                # image handling
+                if self.config.enable_image_fetching:
+                    self.get_image()
 
-            # post cleanup
-            if crawl_sub:
-                self.article._top_node = self.extractor.post_cleanup()
+                # post cleanup
+                if crawl_sub:
+                    self.article._top_node = self.extractor.post_cleanup()
 
+        if self.article._top_node is not None:
             # clean_text
             self.article._cleaned_text = self.formatter.get_formatted_text(
                 remove_fewwords=crawl_sub)
@@ -304,10 +355,10 @@ class Crawler(object):
                 sub_article = self.article.sub_articles[i]
                 if sub_article.node == self.article.doc:
                     continue
-                crawler = Crawler(self.config)
+                crawler = Crawler(self.config, self.fetcher)
                 crawled_article = crawler.crawl(
                     CrawlCandidate(
-                        self.config, final_url, raw_html=sub_article.outer_html),
+                        self.config, final_url, raw_html=None, doc=sub_article.doc),
                     crawl_sub=False
                 )
                 sub_article.crawled_article = crawled_article
@@ -332,7 +383,7 @@ class Crawler(object):
     @staticmethod
     def get_parse_candidate(crawl_candidate):
         if crawl_candidate.doc is not None:
-            return SubArticle.get_parsing_candidate(crawl_candidate.doc)
+            return SubArticle.get_parsing_candidate(crawl_candidate.doc, crawl_candidate.url)
         if crawl_candidate.raw_html:
             return RawHelper.get_parsing_candidate(crawl_candidate.url, crawl_candidate.raw_html)
         return URLHelper.get_parsing_candidate(crawl_candidate.url)
@@ -350,15 +401,36 @@ class Crawler(object):
 
         # fetch HTML
         response = self.fetcher.fetch_obj(parsing_candidate.url)
+        html, crawl_candidate.encoding = self.get_response_body(response)
+        crawl_candidate.raw_html = html
+        return html
+
+    def get_response_body(self, response):
+        ''' return the body of the response along with its encoding: the raw
+            bytes and the header charset when `bytes_first` is set so that the
+            page is decoded once by the parser, the decoded html and the
+            charset sniffed from the raw bytes, if any, otherwise '''
+        if self.config.bytes_first:
+            encoding = get_encoding_from_headers(response.headers)
+            self.article._meta_encoding = encoding
+            return response.content or b'', encoding
+        return self.get_response_html(response)
+
+    def get_response_html(self, response):
+        ''' return the decoded html along with the charset sniffed from the
+            raw bytes, if any, so that the parser and the metas extractor do
+            not sniff the decoded html again '''
+        sniffed_encoding = None
         if response.encoding != 'ISO-8859-1':  # requests has a good idea; use what it says
             # return response as a unicode string
             html = response.text
             self.article._meta_encoding = response.encoding
         else:
             html = response.content
-            encodings = get_encodings_from_content(response.text)
+            encodings = get_encodings_from_content(html)
             if len(encodings) > 0:
                 self.article._meta_encoding = encodings[0]
+                sniffed_encoding = encodings[0]
                 response.encoding = encodings[0]
                 html = response.text
             else:
@@ -366,37 +438,97 @@ class Crawler(object):
 
         if not html:
             html = ""
+        return html, sniffed_encoding
+
+    def get_print_variant_url(self, url):
+        for pattern, replacement in self.config.print_variant_patterns:
+            variant_url, count = re.subn(pattern, replacement, url, count=1)
+            if count:
+                return variant_url
+        return None
+
+    def get_amphtml_variant_url(self, html, url):
+        link = get_amphtml_link(html)
+        if link:
+            return urljoin(url, link)
+        return None
+
+    def crawl_variant(self, url, crawl_sub=True):
+        ''' crawl the lightweight variant of a page; returns None if the
+            variant cannot be fetched or yields no text, so that the caller
+            can fall back to the full page '''
+        if not url:
+            return None
+        try:
+            response = self.fetcher.fetch_obj(url)
+        except RequestException:
+            return None
+        if not response.ok:
+            return None
+
+        crawler = Crawler(self.config, self.fetcher)
+        html, encoding = crawler.get_response_body(response)
+        if not html:
+            return None
+        article = crawler.crawl(CrawlCandidate(self.config, response.url, html, encoding=encoding), crawl_sub)
+        if not article.cleaned_text:
+            return None
+        return article
+
+    def get_streamed_document(self, crawl_candidate, parsing_candidate):
+        ''' fetch the page and build its document while the body is being
+            downloaded; the raw html is kept on the crawl candidate '''
+        response = self.fetcher.fetch_stream(parsing_candidate.url)
+        # requests falls back to ISO-8859-1 when the headers carry no charset
+        encoding = None
+        if 'charset' in response.headers.get('content-type', '').lower():
+            encoding = response.encoding
+
+        chunks = []
+
+        def read_chunks():
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                chunks.append(chunk)
+                yield chunk
+
+        try:
+            doc = self.parser.fromchunks(read_chunks(), encoding=encoding)
+        finally:
+            response.close()
+
+        encoding = encoding or doc.getroottree().docinfo.encoding or 'utf-8'
+        try:
+            html = b''.join(chunks).decode(encoding, errors='replace')
+        except LookupError:
+            html = b''.join(chunks).decode('utf-8', errors='replace')
+        self.article._meta_encoding = encoding
         crawl_candidate.raw_html = html
+        return doc
 
-        # Twitter/Facebook specific news crawling. Should be transferred to separate module.
-        site_domain = goose3.text.get_site_domain(parsing_candidate.url)
-        if site_domain == "twitter.com":
-            doc = self.parser.fromstring(html)
-            a_links = self.parser.getElementsByTag(
-                doc, tag='a', attr='class', value='twitter-timeline-link')
-            if a_links:
-                parsing_candidate.url = self.parser.getAttribute(a_links[0], 'href')
-                html = self.fetcher.fetch(parsing_candidate.url)
-                crawl_candidate.raw_html = html
-        elif site_domain == "www.facebook.com" and "/posts/" in parsing_candidate.url:
-            html = html.replace("<!--", "")
-            html = html.replace("-->", "")
-            doc = self.parser.fromstring(html)
-            a_links = self.parser.xpath_re(
-                doc, "//*[@class='hidden_elem']/descendant::a")
-
-            link_re = re.compile(r"https?://l\.facebook\.com/l\.php\?u=(?P<url>[^&]+)&h")
-            for a_link in a_links:
-                href = a_link.attrib.get('href')
-                match = link_re.search(href)
-                if match:
-                    url = match.groupdict()["url"]
-                    parsing_candidate.url = urllib.parse.unquote(url)
-                    html = self.fetcher.fetch(parsing_candidate.url)
-                    crawl_candidate.raw_html = html
-                    break
-
-        return html
+    def resolve_domain(self, crawl_candidate, parsing_candidate, doc=None):
+        ''' run the configured domain resolvers on the fetched page; the page
+            is parsed only if a resolver applies, and the document is returned
+            so that it does not have to be parsed again '''
+        resolvers = [resolver for resolver in self.config.domain_resolvers
+                     if resolver.matches(parsing_candidate.url)]
+        if not resolvers:
+            return doc
+
+        html = crawl_candidate.raw_html
+        for resolver in resolvers:
+            html = resolver.prepare(html)
+        crawl_candidate.raw_html = html
+        doc = self.get_document(html, crawl_candidate.encoding)
+
+        for resolver in resolvers:
+            url = resolver.resolve(self.parser, doc, parsing_candidate.url)
+            if url:
+                parsing_candidate.url = url
+                crawl_candidate.url = url
+                response = self.fetcher.fetch_obj(url)
+                crawl_candidate.raw_html, crawl_candidate.encoding = self.get_response_body(response)
+                return None
+        return doc
 
     def get_metas_extractor(self):
         return MetasExtractor(self.config, self.article)
@@ -438,17 +570,16 @@ class Crawler(object):
         return HCardExtractor(self.config, self.article)
 
     def get_formatter(self):
-        return StandardOutputFormatter(self.config, self.article)
+        return self.config.formatter_class(self.config, self.article)
 
     def get_cleaner(self):
-        return StandardDocumentCleaner(self.config, self.article)
+        return self.config.cleaner_class(self.config, self.article)
 
-    def get_document(self, raw_html):
-        doc = self.parser.fromstring(raw_html)
-        return doc
+    def get_document(self, raw_html, encoding=None):
+        return parse_document(self.parser, raw_html, encoding, self.config.strip_scripts)
 
     def get_extractor(self):
-        return StandardContentExtractor(self.config, self.article)
+        return self.config.extractor_class(self.config, self.article)
 
     def release_resources(self):
         path = os.path.join(self.config.local_storage_path, '%s_*' % self.article.link_hash)
@@ -20,6 +20,7 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import heapq
 from copy import deepcopy
 from operator import itemgetter
 
@@ -27,8 +28,21 @@ from goose3.extractors import BaseExtractor
 from goose3.sub_article import SubArticle
 
 
+def import_numpy():
+    ''' numpy, imported on first use so that importing goose3 does not load
+        it; None when it is not installed '''
+    try:
+        import numpy
+    except ImportError:  # numpy is an optional dependency
+        return None
+    return numpy
+
+
 BAD_ARTICLE_ATTRIBS = set(('alert',))
 
+CANDIDATE_TAGS = ('p', 'pre', 'td')
+CANDIDATE_NODES_RE = "descendant::*[%s]" % ' or '.join('self::%s' % tag for tag in CANDIDATE_TAGS)
+
 REMOVE_TAGS_RE = r"fig*|header"
 REMOVE_ATTR_RE = r"image-"
 NAUGHTY_ELEM_RE_LIST = [
@@ -36,8 +50,38 @@ NAUGHTY_ELEM_RE_LIST = [
     "descendant::*[contains(@class, '%s')]" % REMOVE_ATTR_RE,
 ]
 
+
+class NodeStats(object):
+    """
+    statistics of a node used for the scoring; filled in when first
+    needed and kept for the whole extraction
+    """
+    def __init__(self, text):
+        self.text = text
+        self.word_stats = None
+        self.high_link_density = None
+
+
 class ContentExtractor(BaseExtractor):
 
+    def __init__(self, config, article):
+        super(ContentExtractor, self).__init__(config, article)
+
+        # node statistics, keyed by node
+        self.node_stats = {}
+
+        # number of links under a node and number of spaces in their text,
+        # keyed by node
+        self.link_stats = {}
+
+        # scores and number of scored paragraphs, keyed by node; the
+        # scores are shared with the output formatter
+        self.node_scores = article._node_scores
+        self.node_counts = {}
+
+        # nodes to check under a document root, keyed by root
+        self.candidate_nodes = {}
+
     def get_language(self):
         """
         Returns the language is by the article or
@@ -51,21 +95,10 @@ class ContentExtractor(BaseExtractor):
         return self.config.target_language
 
     def get_known_article_tags(self):
-        nodes = []
-        for item in self.config.known_context_patterns:
-            # if this is a domain specific config and the current
-            # article domain does not match the configured domain,
-            # do not use the configured content pattern
-            if item.domain and self.article.domain != item.domain:
-                continue
-
-            if item.xpath:
-                nodes.extend(
-                    self.parser.getElementsByXPath(self.article.doc, item.xpath)
-                )
-            else:
-                nodes.extend(self.parser.getElementsByTag(self.article.doc, tag=item.tag,
-                                                      attr=item.attr, value=item.value))
+        # only the generic patterns and the ones configured
+        # for the article domain are looked for
+        patterns = self.config.get_context_patterns(self.article.domain)
+        nodes = patterns.find(self.parser, self.article.doc)
         if nodes:
             for node in nodes:
                 if len(self.parser.xpath_re(
@@ -77,42 +110,56 @@ class ContentExtractor(BaseExtractor):
         return None
 
     def is_articlebody(self, node):
-        for item in self.config.known_context_patterns:
-            # if this is a domain specific config and the current
-            # article domain does not match the configured domain,
-            # do not use the configured content pattern
-            if item.domain and self.article.domain != item.domain:
-                continue
-
-            # attribute
-            if item.attr:
-                if self.parser.getAttribute(node, item.attr) == item.value:
-                    return True
-
-            # tag
-            if item.tag:
-                if node.tag == item.tag:
-                    return True
-
-        return False
+        patterns = self.config.get_context_patterns(self.article.domain)
+        return patterns.is_articlebody(self.parser, node)
 
     def calculate_best_node(self, doc):
         top_node = None
         nodes_to_check = self.nodes_to_check(doc)
-
-        starting_boost = float(1.0)
-        cnt = 0
-        i = 0
-        parent_nodes = []
         nodes_with_text = []
 
         for node in nodes_to_check:
-            text_node = self.parser.getText(node)
-            word_stats = self.stopwords_class(language=self.get_language()).get_stopword_count(text_node)
-            high_link_density = self.is_highlink_density(node)
-            if word_stats.get_stopword_count() > 2 and not high_link_density:
+            word_stats = self.get_word_stats(node)
+            if word_stats.get_stopword_count() > 2 and not self.is_highlink_density(node):
                 nodes_with_text.append(node)
 
+        if self.config.scoring_backend == 'numpy' and import_numpy() is not None:
+            parent_nodes = self.score_nodes_vectorised(nodes_with_text)
+        else:
+            parent_nodes = self.score_nodes(nodes_with_text)
+
+        top_node_score = 0
+        average_score = 0
+
+        for itm in parent_nodes:
+            score = self.get_score(itm)
+
+            if score > top_node_score:
+                if top_node is not None:
+                    average_score = (average_score + score)*.5
+                else:
+                    average_score = score
+                top_node = itm
+                top_node_score = score
+
+            if top_node is None:
+                top_node = itm
+        # if top_node is not None and average_score != 0:
+        #    score_by_avg =  self.get_score(top_node)/average_score
+        #    self.parser.setAttribute(top_node, "scoreByAvg", str(score_by_avg))
+        return top_node
+
+    def score_nodes(self, nodes_with_text):
+        """\
+        scores the ancestors of the nodes with text and returns
+        them in the order they were first reached
+        """
+        starting_boost = float(1.0)
+        cnt = 0
+        i = 0
+        # scored ancestors in the order they were first reached
+        parent_nodes = {}
+
         nodes_number = len(nodes_with_text)
         negative_scoring = 0
         bottom_negativescore_nodes = float(nodes_number) * 0.25
@@ -133,47 +180,83 @@ class ContentExtractor(BaseExtractor):
                     if negscore > 40:
                         boost_score = float(5)
 
-            text_node = self.parser.getText(node)
-            word_stats = self.stopwords_class(language=self.get_language()).get_stopword_count(text_node)
+            word_stats = self.get_word_stats(node)
             upscore = int(word_stats.get_stopword_count() + boost_score)
 
             # update all parents
-            def updateParent(node, depth=1):
-                parent_node = self.parser.getParent(node)
-                if parent_node is not None:
-                    self.update_score(parent_node, upscore*(1.5/(depth+0.5)))
-                    self.update_node_count(parent_node, 1)
-
-                    if parent_node not in parent_nodes:
-                        parent_nodes.append(parent_node)
-
-                    updateParent(parent_node, depth+1)
-
-            updateParent(node)
+            depth = 1
+            parent_node = self.parser.getParent(node)
+            while parent_node is not None:
+                self.update_score(parent_node, upscore*(1.5/(depth+0.5)))
+                self.update_node_count(parent_node, 1)
+                parent_nodes[parent_node] = None
+                parent_node = self.parser.getParent(parent_node)
+                depth += 1
 
             cnt += 1
             i += 1
 
-        top_node_score = 0
-        average_score = 0
-
-        for itm in parent_nodes:
-            score = self.get_score(itm)
-
-            if score > top_node_score:
-                if top_node is not None:
-                    average_score = (average_score + score)*.5
-                else:
-                    average_score = score
-                top_node = itm
-                top_node_score = score
+        return list(parent_nodes)
 
-            if top_node is None:
-                top_node = itm
-        # if top_node is not None and average_score != 0:
-        #    score_by_avg =  self.get_score(top_node)/average_score
-        #    self.parser.setAttribute(top_node, "scoreByAvg", str(score_by_avg))
-        return top_node
+    def score_nodes_vectorised(self, nodes_with_text):
+        """\
+        same as score_nodes but the boosts and the propagation of the
+        scores to the ancestors are computed on numpy arrays
+        """
+        numpy = import_numpy()
+        nodes_number = len(nodes_with_text)
+        stopwords = numpy.array([self.get_word_stats(node).get_stopword_count()
+                                 for node in nodes_with_text], dtype=float)
+        boostable = numpy.array([self.is_boostable(node) for node in nodes_with_text], dtype=bool)
+
+        # boost: 50, 50/2, 50/3... for the boostable nodes in order
+        starting_boost = numpy.maximum(numpy.cumsum(boostable), 1)
+        boost_score = numpy.where(boostable, (1.0 / starting_boost) * 50, 0.0)
+
+        # negative score for the last quarter of the nodes
+        if nodes_number > 15:
+            bottom_negativescore_nodes = float(nodes_number) * 0.25
+            remaining = nodes_number - numpy.arange(nodes_number)
+            booster = bottom_negativescore_nodes - remaining
+            negative_score = -numpy.power(booster, 2.0)
+            negative_score = numpy.where(numpy.abs(negative_score) > 40, 5.0, negative_score)
+            boost_score = numpy.where(remaining <= bottom_negativescore_nodes, negative_score, boost_score)
+
+        upscore = numpy.trunc(stopwords + boost_score)
+
+        # flatten the ancestors: index of the parent of each node with text
+        # and of the parent of each ancestor, -1 for the root
+        parent_nodes = []
+        ancestor_index = {None: -1}
+        for node in nodes_with_text:
+            parent_node = self.parser.getParent(node)
+            while parent_node not in ancestor_index:
+                ancestor_index[parent_node] = len(parent_nodes)
+                parent_nodes.append(parent_node)
+                parent_node = self.parser.getParent(parent_node)
+        first_parents = numpy.array([ancestor_index[self.parser.getParent(node)] for node in nodes_with_text],
+                                    dtype=numpy.intp)
+        ancestor_parents = numpy.array([ancestor_index[self.parser.getParent(node)] for node in parent_nodes],
+                                       dtype=numpy.intp)
+
+        # update all parents, one level at a time
+        scores = numpy.zeros(len(parent_nodes))
+        counts = numpy.zeros(len(parent_nodes), dtype=numpy.intp)
+        current = first_parents
+        depth = 1
+        while current.size:
+            reached = current >= 0
+            current = current[reached]
+            upscore = upscore[reached]
+            numpy.add.at(scores, current, numpy.trunc(upscore * (1.5 / (depth + 0.5))))
+            numpy.add.at(counts, current, 1)
+            current = ancestor_parents[current]
+            depth += 1
+
+        for parent_node, score, count in zip(parent_nodes, scores.tolist(), counts.tolist()):
+            self.update_score(parent_node, score)
+            self.update_node_count(parent_node, count)
+        return parent_nodes
 
     def get_score_by_avg(self, node):
         """\
@@ -208,8 +291,7 @@ class ContentExtractor(BaseExtractor):
             if current_node_tag == para:
                 if steps_away >= max_stepsaway_from_node:
                     return False
-                para_text = self.parser.getText(current_node)
-                word_stats = self.stopwords_class(language=self.get_language()).get_stopword_count(para_text)
+                word_stats = self.get_word_stats(current_node)
                 if word_stats.get_stopword_count() > minimum_stopword_count:
                     return True
                 steps_away += 1
@@ -219,21 +301,17 @@ class ContentExtractor(BaseExtractor):
         """\
         get how many decent nodes are under a parent node
         """
-        current_score = 0
-        count_string = self.parser.getAttribute(node, 'gravityNodes')
-        if count_string:
-            current_score = int(count_string)
-
-        return current_score
+        return self.node_counts.get(node, 0)
 
     def walk_siblings(self, node):
+        """\
+        yields the previous siblings of the node, closest first;
+        callers can stop as soon as they found what they need
+        """
         current_sibling = self.parser.previousSibling(node)
-        res = []
         while current_sibling is not None:
-            res.append(current_sibling)
-            previous_sibling = self.parser.previousSibling(current_sibling)
-            current_sibling = None if previous_sibling is None else previous_sibling
-        return res
+            yield current_sibling
+            current_sibling = self.parser.previousSibling(current_sibling)
 
     def add_siblings(self, top_node):
         # in case the extraction used known attributes
@@ -241,11 +319,13 @@ class ContentExtractor(BaseExtractor):
         if self.is_articlebody(top_node):
             return top_node
         baselinescore_siblings_para = self.get_siblings_score(top_node)
-        results = self.walk_siblings(top_node)
+        # the siblings get moved into the top node; collect them first
+        results = list(self.walk_siblings(top_node))
         for current_node in results:
             prev_sibs = self.get_siblings_content(current_node, baselinescore_siblings_para)
             for prev in prev_sibs:
                 top_node.insert(0, prev)
+                self.parser.invalidate_text(top_node)
         return top_node
 
     def get_siblings_content(self, current_sibling, baselinescore_siblings_para):
@@ -267,7 +347,7 @@ class ContentExtractor(BaseExtractor):
             for first_paragraph in potential_paragraphs:
                 text = self.parser.getText(first_paragraph)
                 if text:  # no len(text) > 0
-                    word_stats = self.stopwords_class(language=self.get_language()).get_stopword_count(text)
+                    word_stats = self.get_word_stats(first_paragraph)
                     paragraph_score = word_stats.get_stopword_count()
                     sibling_baseline_score = float(.30)
                     high_link_density = self.is_highlink_density(first_paragraph)
@@ -293,10 +373,8 @@ class ContentExtractor(BaseExtractor):
         nodes_to_check = self.parser.getElementsByTag(top_node, tag='p')
 
         for node in nodes_to_check:
-            text_node = self.parser.getText(node)
-            word_stats = self.stopwords_class(language=self.get_language()).get_stopword_count(text_node)
-            high_link_density = self.is_highlink_density(node)
-            if word_stats.get_stopword_count() > 2 and not high_link_density:
+            word_stats = self.get_word_stats(node)
+            if word_stats.get_stopword_count() > 2 and not self.is_highlink_density(node):
                 paragraphs_number += 1
                 paragraphs_score += word_stats.get_stopword_count()
 
@@ -307,29 +385,38 @@ class ContentExtractor(BaseExtractor):
 
     def update_score(self, node, add_to_score):
         """
-        adds a score to the gravityScore Attribute we put on divs
-        we'll get the current score then add the score
-        we're passing in to the current
+        adds a score to the score we keep for the node
         """
-        current_score = 0
-        score_string = self.parser.getAttribute(node, 'gravityScore')
-        if score_string:
-            current_score = int(score_string)
-
-        new_score = current_score + int(add_to_score)
-        self.parser.setAttribute(node, "gravityScore", str(new_score))
+        self.node_scores[node] = self.node_scores.get(node, 0) + int(add_to_score)
 
     def update_node_count(self, node, add_to_count):
         """\
         stores how many decent nodes are under a parent node
         """
-        current_score = 0
-        count_string = self.parser.getAttribute(node, 'gravityNodes')
-        if count_string:
-            current_score = int(count_string)
+        self.node_counts[node] = self.node_counts.get(node, 0) + add_to_count
 
-        new_score = current_score + add_to_count
-        self.parser.setAttribute(node, "gravityNodes", str(new_score))
+    def get_node_stats(self, node):
+        """
+        returns the statistics of the node, started over
+        if the text of the node changed since they were taken
+        """
+        text = self.parser.getText(node)
+        stats = self.node_stats.get(node)
+        if stats is None or stats.text != text:
+            if stats is not None:
+                self.link_stats.pop(node, None)
+            stats = self.node_stats[node] = NodeStats(text)
+        return stats
+
+    def get_word_stats(self, node):
+        """
+        returns the word and stopword counts of the node's text
+        """
+        stats = self.get_node_stats(node)
+        if stats.word_stats is None:
+            stopwords = self.stopwords_class(language=self.get_language())
+            stats.word_stats = stopwords.get_stopword_count(stats.text)
+        return stats.word_stats
 
     def is_highlink_density(self, element):
         """
@@ -337,21 +424,25 @@ class ContentExtractor(BaseExtractor):
         is there not much text and most of it contains linky shit?
         if so it's no good
         """
-        links = self.parser.getElementsByTag(element, tag='a')
+        if not isinstance(element.tag, str):
+            # comments and processing instructions hold no links
+            return False
+        stats = self.get_node_stats(element)
+        if stats.high_link_density is None:
+            stats.high_link_density = self.calculate_highlink_density(element)
+        return stats.high_link_density
+
+    def calculate_highlink_density(self, element):
+        links, link_spaces = self.get_link_stats(element)
         if not links:
             return False
 
+        # words are counted as the pieces of the text split on spaces, the
+        # text of the links being joined together
         text = self.parser.getText(element)
-        words = text.split(' ')
-        words_number = float(len(words))
-        link_text_parts = []
-        for link in links:
-            link_text_parts.append(self.parser.getText(link))
-
-        link_text = ''.join(link_text_parts)
-        link_words = link_text.split(' ')
-        number_of_link_words = float(len(link_words))
-        number_of_links = float(len(links))
+        words_number = float(text.count(' ') + 1)
+        number_of_link_words = float(link_spaces + 1)
+        number_of_links = float(links)
         link_divisor = float(number_of_link_words / words_number)
         score = float(link_divisor * number_of_links)
         if score >= 1.0:
@@ -359,17 +450,39 @@ class ContentExtractor(BaseExtractor):
         return False
         # return True if score > 1.0 else False
 
+    def get_link_stats(self, node):
+        """
+        returns the number of links under the node and the number of
+        spaces in their text; they are counted for the whole tree at once
+        """
+        stats = self.link_stats.get(node)
+        if stats is None:
+            root = node.getroottree().getroot()
+            self.count_links(node if root in self.link_stats else root)
+            stats = self.link_stats[node]
+        return stats
+
+    def count_links(self, root):
+        for node in self.parser.iterPostOrder(root):
+            links = link_spaces = 0
+            for child in node:
+                child_stats = self.link_stats.get(child)
+                if child_stats is not None:
+                    links += child_stats[0]
+                    link_spaces += child_stats[1]
+                if child.tag == 'a':
+                    links += 1
+                    link_spaces += self.parser.getText(child).count(' ')
+            self.link_stats[node] = (links, link_spaces)
+
     def get_score(self, node):
         """
-        returns the gravityScore as an integer from this node
+        returns the score of this node
         """
         return self.get_node_gravity_score(node) or 0
 
     def get_node_gravity_score(self, node):
-        grv_score_string = self.parser.getAttribute(node, 'gravityScore')
-        if not grv_score_string:
-            return None
-        return int(grv_score_string)
+        return self.node_scores.get(node)
 
     def nodes_to_check(self, docs):
         """\
@@ -379,11 +492,36 @@ class ContentExtractor(BaseExtractor):
         nodes_to_check = []
 
         for doc in docs:
-            for tag in ['p', 'pre', 'td']:
-                items = self.parser.getElementsByTag(doc, tag=tag)
-                nodes_to_check += items
+            nodes_to_check += self.get_candidate_nodes(doc)
+
+        max_nodes = self.config.max_candidate_nodes
+        if max_nodes and len(nodes_to_check) > max_nodes:
+            nodes_to_check = self.sample_nodes(nodes_to_check, max_nodes)
         return nodes_to_check
 
+    def get_candidate_nodes(self, doc):
+        """\
+        returns the paragraphs, then the pre and then the td under
+        the document root, found in a single pass and kept for
+        the next time the same root is checked
+        """
+        nodes = self.candidate_nodes.get(doc)
+        if nodes is None:
+            nodes_by_tag = dict((tag, []) for tag in CANDIDATE_TAGS)
+            for node in self.parser.xpath_re(doc, CANDIDATE_NODES_RE):
+                nodes_by_tag[self.parser.getTag(node)].append(node)
+            nodes = [node for tag in CANDIDATE_TAGS for node in nodes_by_tag[tag]]
+            self.candidate_nodes[doc] = nodes
+        return nodes
+
+    def sample_nodes(self, nodes, max_nodes):
+        """\
+        keeps the nodes with the longest text, in their order
+        """
+        lengths = [len(self.parser.getText(node)) for node in nodes]
+        kept = heapq.nlargest(max_nodes, range(len(nodes)), key=lengths.__getitem__)
+        return [nodes[i] for i in sorted(kept)]
+
     def is_table_and_no_para_exist(self, elm):
         sub_paragraphs = self.parser.getElementsByTag(elm, tag='p')
         if len(sub_paragraphs) == 1:
@@ -393,19 +531,28 @@ class ContentExtractor(BaseExtractor):
             if len(txt) < 25:
                 self.parser.remove(para)
 
-        sub_paragraphs2 = self.parser.getElementsByTag(elm, tag='p')
-        if not sub_paragraphs2 and elm.tag != "td":
-            return True
-        return False
+        if elm.tag == "td":
+            return False
+        # the paragraphs left are the ones still attached to the element
+        for para in sub_paragraphs:
+            parent_node = self.parser.getParent(para)
+            while parent_node is not None and parent_node is not elm:
+                parent_node = self.parser.getParent(parent_node)
+            if parent_node is not None:
+                return False
+        return True
 
-    def is_nodescore_threshold_met(self, node, elm):
+    def get_nodescore_threshold(self, node):
         top_node_score = self.get_score(node)
-        current_node_score = self.get_score(elm)
         node_count = self.get_node_count(node)
         if node_count == 0:
            node_count = 1
-        threshold_score = float(top_node_score * .08 / node_count)
-        # threshold_score = float(top_node_score * .08)
+        return float(top_node_score * .08 / node_count)
+
+    def is_nodescore_threshold_met(self, node, elm, threshold_score=None):
+        if threshold_score is None:
+            threshold_score = self.get_nodescore_threshold(node)
+        current_node_score = self.get_score(elm)
 
         if (current_node_score < threshold_score) and elm.tag != 'td':
             return False
@@ -424,12 +571,19 @@ class ContentExtractor(BaseExtractor):
 
         target_node = self.article.top_node
         node = self.add_siblings(target_node)
+
+        # the link statistics and the scores of the scoring are reused;
+        # every child is looked at before any of them is removed
+        threshold_score = self.get_nodescore_threshold(node)
+        removed = []
         for elm in self.parser.getChildren(node):
             e_tag = self.parser.getTag(elm)
             if e_tag not in parse_tags:
                 if (self.is_highlink_density(elm) or self.is_table_and_no_para_exist(elm) or
-                        not self.is_nodescore_threshold_met(node, elm)):
-                    self.parser.remove(elm)
+                        not self.is_nodescore_threshold_met(node, elm, threshold_score)):
+                    removed.append(elm)
+        for elm in removed:
+            self.parser.remove(elm)
 
         # tag
         for elem_re in NAUGHTY_ELEM_RE_LIST:
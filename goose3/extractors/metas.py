@@ -125,8 +125,12 @@ class MetasExtractor(BaseExtractor):
         """
         return self.get_meta_content("meta[name=keywords]")
 
-    def get_meta_encoding(self):
-        """ Parse the meta encoding """
+    def get_meta_encoding(self, encoding=None):
+        """ Parse the meta encoding, unless it was already sniffed """
+        if encoding:
+            return encoding
+        if not self.article.raw_html:
+            return None
         encoding = get_encodings_from_content(self.article.raw_html)
         return encoding and encoding[0] or None
 
@@ -146,7 +150,7 @@ class MetasExtractor(BaseExtractor):
             metatags[name] = value.strip()
         return metatags
 
-    def extract(self):
+    def extract(self, encoding=None):
         return {
             "description": self.get_meta_description(),
             "keywords": self.get_meta_keywords(),
@@ -154,6 +158,6 @@ class MetasExtractor(BaseExtractor):
             "favicon": self.get_favicon(),
             "canonical": self.get_canonical_link(),
             "domain": self.get_domain(),
-            "encoding": self.get_meta_encoding(),
+            "encoding": self.get_meta_encoding(encoding),
             "metatags": self.get_all_metatags()
         }
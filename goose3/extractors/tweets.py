@@ -34,8 +34,9 @@ class TweetsExtractor(BaseExtractor):
                                              value="twitter-tweet")
 
         for i in items:
-            for attr in ['gravityScore', 'gravityNodes']:
-                self.parser.delAttribute(i, attr)
+            # unscored, the tweet is dropped from the cleaned text by the
+            # post cleanup; it is available in `Article.tweets` instead
+            self.article._node_scores.pop(i, None)
             tweets.append(self.parser.nodeToString(i))
 
         return tweets
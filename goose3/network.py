@@ -20,7 +20,13 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import base64
+import json
+import threading
+
 import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
 
 
 class NetworkError(RuntimeError):
@@ -31,6 +37,80 @@ class NetworkError(RuntimeError):
         super(NetworkError, self).__init__(self.message)
 
 
+class InFlightRequest(object):
+    ''' A request that is currently on the wire; callers asking for the same
+        URL wait on it instead of issuing a request of their own '''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class FetchArchive(object):
+    ''' Record HTTP exchanges into a file (one JSON document per line) and
+        replay them later without any network access '''
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def record(self, url, response):
+        entry = {
+            'url': url,
+            'final_url': response.url,
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'content': base64.b64encode(response.content or b'').decode('ascii'),
+        }
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as fobj:
+                fobj.write(json.dumps(entry) + '\n')
+            if self._entries is not None:
+                self._entries[url] = entry
+
+    def replay(self, url):
+        with self._lock:
+            if self._entries is None:
+                self._entries = self.load()
+            entry = self._entries.get(url)
+
+        response = requests.Response()
+        response.url = url
+        # the body is held in memory, there is no connection to read it from
+        response._content_consumed = True
+        if entry is None:
+            response.status_code = 404
+            response.reason = 'Not Archived'
+            response._content = b''
+            return response
+
+        response.url = entry['final_url']
+        response.status_code = entry['status_code']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(entry['content'])
+        return response
+
+    def load(self):
+        entries = {}
+        with open(self.path, 'r', encoding='utf-8') as fobj:
+            for line in fobj:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry['url']] = entry
+        return entries
+
+
 class NetworkFetcher(object):
 
     def __init__(self, config):
@@ -38,6 +118,14 @@ class NetworkFetcher(object):
         self._connection = requests.Session()
         self._connection.headers['User-agent'] = self.config.browser_user_agent
         self._url = None
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self._archive = None
+        if self.config.http_archive_mode:
+            if not self.config.http_archive_path:
+                raise ValueError("http_archive_path is required with http archive mode: {}".format(
+                    self.config.http_archive_mode))
+            self._archive = FetchArchive(self.config.http_archive_path)
 
     def close(self):
         if self._connection is not None:
@@ -61,5 +149,46 @@ class NetworkFetcher(object):
         return text
 
     def fetch_obj(self, url):
-        return self._connection.get(url, timeout=self.config.http_timeout, headers=self.config.http_headers,
-                                    proxies=self.config.http_proxies, auth=self.config.http_auth)
+        ''' Fetch the response for the url; concurrent calls for the same url
+            share a single request and all receive its response '''
+        with self._in_flight_lock:
+            request = self._in_flight.get(url)
+            leader = request is None
+            if leader:
+                request = InFlightRequest()
+                self._in_flight[url] = request
+
+        if not leader:
+            return request.wait()
+
+        try:
+            request.response = self._get(url)
+        except Exception as ex:
+            request.error = ex
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[url]
+            request.done.set()
+        return request.response
+
+    def fetch_stream(self, url):
+        ''' Fetch the response for the url without reading its body so that
+            it can be consumed chunk by chunk with `iter_content`; streamed
+            requests are not shared with concurrent callers '''
+        if self.config.http_archive_mode:
+            # archived bodies are read at once and replayed bodies are held in
+            # memory, iter_content slices them
+            return self.fetch_obj(url)
+        return self._get(url, stream=True)
+
+    def _get(self, url, stream=False):
+        if self.config.http_archive_mode == 'replay':
+            return self._archive.replay(url)
+
+        response = self._connection.get(url, timeout=self.config.http_timeout, headers=self.config.http_headers,
+                                        proxies=self.config.http_proxies, auth=self.config.http_auth,
+                                        stream=stream)
+        if self.config.http_archive_mode == 'record':
+            self._archive.record(url, response)
+        return response
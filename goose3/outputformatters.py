@@ -114,15 +114,19 @@ class OutputFormatter(object):
     def remove_negativescores_nodes(self):
         """\
         if there are elements inside our top node
-        that have a negative gravity score,
+        that have a negative score,
         let's give em the boot
         """
-        gravity_items = self.parser.css_select(self.top_node, "*[gravityScore]")
-        for item in gravity_items:
-            score = self.parser.getAttribute(item, 'gravityScore')
-            score = int(score, 0)
-            if score < 1:
-                item.getparent().remove(item)
+        # the scores used to be read back from gravityScore attributes with
+        # a css selector that only matched with ParserXML; with the other
+        # parsers the nodes were never dropped and their output is kept as
+        # it was, see Parser.drop_negative_scores
+        if not self.parser.drop_negative_scores:
+            return
+        scores = self.article._node_scores
+        for item in list(self.top_node.iterdescendants()):
+            if scores.get(item, 1) < 1:
+                self.parser.remove(item)
 
     def replace_with_text(self):
         """\
@@ -20,6 +20,9 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import functools
+import threading
+from contextlib import contextmanager
 from copy import deepcopy
 
 from io import StringIO
@@ -27,42 +30,195 @@ import lxml.html
 from lxml.cssselect import CSSSelector
 from lxml import etree
 
-from goose3.text import innerTrim, encodeValue, get_encodings_from_content, smart_str
+from goose3.text import innerTrim, encodeValue, get_encodings_from_content, smart_str, CHARSET_SNIFF_SIZE
+
+REGEXP_NAMESPACES = {'re': "http://exslt.org/regular-expressions"}
+# compiled expressions kept per thread; the cache is reset once it is full
+# as some expressions embed ids or configured values
+XPATH_CACHE_SIZE = 1024
+
+_local = threading.local()
+
+
+def _thread_cache(name):
+    ''' a dict private to the current thread; lxml parsers and compiled
+        expressions are not shared between threads '''
+    cache = getattr(_local, name, None)
+    if cache is None:
+        cache = {}
+        setattr(_local, name, cache)
+    return cache
+
+
+@functools.lru_cache(maxsize=XPATH_CACHE_SIZE)
+def _css_to_xpath(selector, translator):
+    return CSSSelector(selector, translator=translator).path
 
 
 class Parser(object):
 
+    # translator used for css selectors
+    css_translator = 'html'
+
+    # legacy behaviour: the output formatter only drops the nodes scored
+    # below 1 with the parsers where it historically did, i.e. ParserXML
+    drop_negative_scores = False
+
+    @classmethod
+    def compile_xpath(cls, expression):
+        ''' Compiled XPath for the expression, cached per thread; the `re`
+            prefix maps to the EXSLT regular expressions '''
+        cache = _thread_cache('xpath')
+        xpath = cache.get(expression)
+        if xpath is None:
+            if len(cache) >= XPATH_CACHE_SIZE:
+                cache.clear()
+            xpath = cache[expression] = etree.XPath(expression, namespaces=REGEXP_NAMESPACES)
+        return xpath
+
+    @classmethod
+    def translate_css(cls, selector):
+        ''' XPath expression of the css selector, cached '''
+        return _css_to_xpath(selector, cls.css_translator)
+
+    @classmethod
+    def evaluate(cls, node, expression):
+        ''' Evaluate the cached XPath for the expression on the node '''
+        if not isinstance(node.tag, str):
+            # comments and processing instructions cannot be the input of
+            # a compiled expression
+            return node.xpath(expression, namespaces=REGEXP_NAMESPACES)
+        return cls.compile_xpath(expression)(node)
+
     @classmethod
     def xpath_re(cls, node, expression):
-        regexp_namespace = "http://exslt.org/regular-expressions"
-        items = node.xpath(expression, namespaces={'re': regexp_namespace})
+        items = cls.evaluate(node, expression)
         return items
 
+    @classmethod
+    @contextmanager
+    def text_cache(cls):
+        ''' Memoise `getText` within the block; the mutation helpers of the
+            parser invalidate the text of the nodes they change, changes made
+            to the tree directly must call `invalidate_text` '''
+        previous = getattr(_local, 'text', None)
+        _local.text = {}
+        try:
+            yield
+        finally:
+            _local.text = previous
+
+    @classmethod
+    def invalidate_text(cls, node, descendants=False):
+        ''' Forget the memoised text of the node and of its ancestors, and
+            of its descendants if asked to '''
+        cache = getattr(_local, 'text', None)
+        if not cache:
+            return
+        cache.pop(node, None)
+        for ancestor in node.iterancestors():
+            cache.pop(ancestor, None)
+        if descendants:
+            for child in node.iterdescendants():
+                cache.pop(child, None)
+
     @classmethod
     def drop_tag(cls, nodes):
         if isinstance(nodes, list):
             for node in nodes:
+                cls.invalidate_text(node)
                 node.drop_tag()
         elif hasattr(nodes, 'drop_tag'):
+            cls.invalidate_text(nodes)
             nodes.drop_tag()
 
     @classmethod
     def css_select(cls, node, selector):
-        return node.cssselect(selector)
+        return cls.evaluate(node, cls.translate_css(selector))
 
     @classmethod
-    def fromstring(cls, html):
-        encoding = get_encodings_from_content(html)
-        encoding = encoding and encoding[0] or None
+    def fromstring(cls, html, encoding=None):
+        ''' Build the document from the html; the encoding declared in the
+            html is sniffed unless it is given '''
+        if encoding is None:
+            encoding = get_encodings_from_content(html)
+            encoding = encoding and encoding[0] or None
         if not encoding:
             html = encodeValue(html)
             doc = lxml.html.fromstring(html)
         else:
             html = smart_str(html, encoding=encoding)
-            parser = lxml.html.HTMLParser(encoding=encoding)
+            parser = cls.get_cached_parser(encoding)
             doc = lxml.html.fromstring(html, parser=parser)
         return doc
 
+    @classmethod
+    def fromchunks(cls, chunks, encoding=None):
+        ''' Build the document incrementally from an iterable of bytes
+            chunks, e.g. a response body as it is being downloaded. Without an
+            encoding the start of the document is sniffed for it, and lxml
+            detects it when nothing is declared '''
+        parser = None
+        head = b''
+        for chunk in chunks:
+            if parser is None:
+                head += chunk
+                if len(head) < CHARSET_SNIFF_SIZE:
+                    continue
+                parser = cls.new_html_parser(encoding or cls.sniff_encoding(head))
+                chunk = head
+            parser.feed(chunk)
+        if parser is None:
+            if not head:
+                return cls.fromstring('')
+            parser = cls.new_html_parser(encoding or cls.sniff_encoding(head))
+            parser.feed(head)
+        return parser.close()
+
+    @classmethod
+    def frombytes(cls, data, encoding=None):
+        ''' Build the document from the raw bytes of the page, decoded once
+            by lxml with the given encoding or the one sniffed from the start
+            of the document; lxml detects it when nothing is declared '''
+        encoding = encoding or cls.sniff_encoding(data)
+        return lxml.html.fromstring(data, parser=cls.get_html_parser(encoding))
+
+    @classmethod
+    def sniff_encoding(cls, head):
+        encoding = get_encodings_from_content(head)
+        return encoding and encoding[0] or None
+
+    @classmethod
+    def get_html_parser(cls, encoding):
+        ''' The parser for the encoding shared by the documents parsed in the
+            current thread; unknown encodings fall back to utf-8 '''
+        try:
+            return cls.get_cached_parser(encoding)
+        except LookupError:
+            return cls.get_cached_parser('utf-8')
+
+    @classmethod
+    def get_cached_parser(cls, encoding):
+        parsers = _thread_cache('parsers')
+        key = (cls, encoding)
+        parser = parsers.get(key)
+        if parser is None:
+            parser = parsers[key] = cls.create_html_parser(encoding)
+        return parser
+
+    @classmethod
+    def new_html_parser(cls, encoding):
+        ''' A parser of its own, e.g. to be fed chunk by chunk; unknown
+            encodings fall back to utf-8 '''
+        try:
+            return cls.create_html_parser(encoding)
+        except LookupError:
+            return cls.create_html_parser('utf-8')
+
+    @classmethod
+    def create_html_parser(cls, encoding):
+        return lxml.html.HTMLParser(encoding=encoding)
+
     @classmethod
     def stringToNode(cls, html):
         html = encodeValue(html)
@@ -74,30 +230,31 @@ class Parser(object):
 
     @classmethod
     def replaceTag(cls, node, tag):
+        # the text of a node does not depend on its tag
         node.tag = tag
 
     @classmethod
     def stripTags(cls, node, *tags):
+        cls.invalidate_text(node, descendants=True)
         etree.strip_tags(node, *tags)
 
     @classmethod
     def getElementById(cls, node, idd):
         selector = '//*[@id="%s"]' % idd
-        elems = node.xpath(selector)
+        elems = cls.evaluate(node, selector)
         if elems:
             return elems[0]
         return None
 
     @classmethod
     def getElementsByTag(cls, node, tag=None, attr=None, value=None, childs=False):
-        namespace = "http://exslt.org/regular-expressions"
         # selector = tag or '*'
         selector = 'descendant-or-self::%s' % (tag or '*')
         if attr and value:
             selector = '%s[re:test(@%s, "%s", "i")]' % (selector, attr, value)
         elif attr:
             selector = '%s[@%s]' % (selector, attr)
-        elems = node.xpath(selector, namespaces={"re": namespace})
+        elems = cls.evaluate(node, selector)
         # remove the root node
         # if we have a selection tag
         if node in elems and (tag or childs):
@@ -106,7 +263,7 @@ class Parser(object):
 
     @classmethod
     def getElementsByXPath(cls, node, xpath):
-        elems = node.xpath(xpath)
+        elems = cls.evaluate(node, xpath)
         return elems
 
     @classmethod
@@ -168,7 +325,7 @@ class Parser(object):
 
     @classmethod
     def getComments(cls, node):
-        return node.xpath('//comment()')
+        return cls.evaluate(node, '//comment()')
 
     @classmethod
     def getParent(cls, node):
@@ -178,6 +335,7 @@ class Parser(object):
     def remove(cls, node):
         parent = node.getparent()
         if parent is not None:
+            cls.invalidate_text(node)
             if node.tail:
                 prev = node.getprevious()
                 if prev is None:
@@ -191,12 +349,28 @@ class Parser(object):
             node.clear()
             parent.remove(node)
 
+    @classmethod
+    def iterPostOrder(cls, node):
+        ''' Elements of the subtree, each one after its children '''
+        for _, elm in etree.iterwalk(node, events=('end',)):
+            yield elm
+
     @classmethod
     def getTag(cls, node):
         return node.tag
 
     @classmethod
     def getText(cls, node):
+        cache = getattr(_local, 'text', None)
+        if cache is None:
+            return cls.build_text(node)
+        text = cache.get(node)
+        if text is None:
+            text = cache[node] = cls.build_text(node)
+        return text
+
+    @classmethod
+    def build_text(cls, node):
         txts = [i for i in node.itertext()]
         return innerTrim(' '.join(txts).strip())
 
@@ -209,21 +383,11 @@ class Parser(object):
 
     @classmethod
     def previousSibling(cls, node):
-        nodes = []
-        for idx, val in enumerate(node.itersiblings(preceding=True)):
-            nodes.append(val)
-            if idx == 0:
-                break
-        return nodes[0] if nodes else None
+        return node.getprevious()
 
     @classmethod
     def nextSibling(cls, node):
-        nodes = []
-        for idx, val in enumerate(node.itersiblings(preceding=False)):
-            nodes.append(val)
-            if idx == 0:
-                break
-        return nodes[0] if nodes else None
+        return node.getnext()
 
     @classmethod
     def isTextNode(cls, node):
@@ -257,16 +421,33 @@ class Parser(object):
 
 
 class ParserXML(Parser):
+
+    css_translator = 'xml'
+    drop_negative_scores = True
+
     @classmethod
-    def fromstring(cls, html):
+    def drop_tag(cls, nodes):
+        # plain etree elements do not have the drop_tag of lxml.html
+        if not isinstance(nodes, list):
+            nodes = [nodes]
+        for node in nodes:
+            cls.invalidate_text(node)
+            lxml.html.HtmlMixin.drop_tag(node)
+
+    @classmethod
+    def fromstring(cls, html, encoding=None):
         html = encodeValue(html)
-        doc = etree.parse(StringIO(html), etree.HTMLParser(recover=True)).getroot()
+        doc = etree.parse(StringIO(html), cls.get_cached_parser(None)).getroot()
         return doc
 
     @classmethod
-    def css_select(cls, node, selector):
-        sel = CSSSelector(selector)
-        return node.xpath(sel.path)
+    def frombytes(cls, data, encoding=None):
+        encoding = encoding or cls.sniff_encoding(data)
+        return etree.fromstring(data, cls.get_html_parser(encoding))
+
+    @classmethod
+    def create_html_parser(cls, encoding):
+        return etree.HTMLParser(recover=True, encoding=encoding)
 
     @classmethod
     def getAttribute(cls, node, attr=None):
@@ -278,8 +459,22 @@ class ParserXML(Parser):
 class ParserSoup(Parser):
 
     @classmethod
-    def fromstring(cls, html):
+    def fromstring(cls, html, encoding=None):
         from lxml.html import soupparser
         html = encodeValue(html)
         doc = soupparser.fromstring(html)
         return doc
+
+    @classmethod
+    def fromchunks(cls, chunks, encoding=None):
+        # beautifulsoup has no incremental interface
+        return cls.frombytes(b''.join(chunks), encoding=encoding)
+
+    @classmethod
+    def frombytes(cls, data, encoding=None):
+        if encoding:
+            try:
+                data = data.decode(encoding, errors='replace')
+            except LookupError:
+                pass
+        return cls.fromstring(data)
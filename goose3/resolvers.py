@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""\
+This is a python port of "Goose" orignialy licensed to Gravity.com
+under one or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.
+
+Python port was written by Xavier Grangier for Recrutae
+
+Gravity.com licenses this file
+to you under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import re
+from urllib.parse import unquote
+
+from goose3.text import get_site_domain
+
+
+class DomainResolver(object):
+    ''' Base class of the domain resolvers; a resolver looks at a fetched page
+        of its domain and returns the url of the page holding the actual
+        article, if any, which is then fetched in place of the original page
+
+        Args:
+            domain (str): The site domain, e.g. `www.example.com`, this \
+            resolver applies to
+        Note:
+            The page is only parsed when at least one resolver matches its url \
+            and the parsed document is reused for the extraction
+    '''
+
+    def __init__(self, domain=None):
+        self.domain = domain
+
+    def matches(self, url):
+        ''' Check if the resolver applies to the url; must be cheap as it is
+            called for every fetched page '''
+        return get_site_domain(url) == self.domain
+
+    def prepare(self, html):
+        ''' Alter the raw html before it gets parsed '''
+        return html
+
+    def resolve(self, parser, doc, url):
+        ''' Return the url to fetch instead of `url`, or `None` to keep the
+            current page '''
+        return None
+
+
+class TwitterResolver(DomainResolver):
+    ''' Follow the first link of a tweet '''
+
+    def __init__(self):
+        super(TwitterResolver, self).__init__(domain='twitter.com')
+
+    def resolve(self, parser, doc, url):
+        a_links = parser.getElementsByTag(doc, tag='a', attr='class', value='twitter-timeline-link')
+        if a_links:
+            return parser.getAttribute(a_links[0], 'href')
+        return None
+
+
+class FacebookResolver(DomainResolver):
+    ''' Follow the outgoing link of a facebook post '''
+
+    link_re = re.compile(r"https?://l\.facebook\.com/l\.php\?u=(?P<url>[^&]+)&h")
+
+    def __init__(self):
+        super(FacebookResolver, self).__init__(domain='www.facebook.com')
+
+    def matches(self, url):
+        return super(FacebookResolver, self).matches(url) and '/posts/' in url
+
+    def prepare(self, html):
+        # the post content is hidden inside html comments
+        if isinstance(html, bytes):
+            return html.replace(b'<!--', b'').replace(b'-->', b'')
+        return html.replace('<!--', '').replace('-->', '')
+
+    def resolve(self, parser, doc, url):
+        a_links = parser.xpath_re(doc, "//*[@class='hidden_elem']/descendant::a")
+        for a_link in a_links:
+            href = a_link.attrib.get('href')
+            match = self.link_re.search(href) if href else None
+            if match:
+                return unquote(match.groupdict()["url"])
+        return None
+
+
+DEFAULT_DOMAIN_RESOLVERS = [
+    TwitterResolver(),
+    FacebookResolver(),
+]
@@ -1,3 +1,5 @@
+import hashlib
+import time
 from copy import deepcopy
 
 from goose3.utils import ParsingCandidate
@@ -7,9 +9,15 @@ class SubArticle:
     def __init__(self, node, parser):
         self.parser = parser
         self.node = node
-        self.outer_html = self.parser.outerHtml(node)
+        # the node gets cleaned along with the main article; keep an untouched
+        # copy of it to crawl the sub article from
+        self.doc = deepcopy(node)
+        self.doc.tail = None
         self.crawled_article = None
 
+    @property
+    def outer_html(self):
+        return self.parser.nodeToString(self.doc)
 
     @property
     def authors(self):
@@ -24,5 +32,7 @@ class SubArticle:
         return self.crawled_article.cleaned_text
 
     @classmethod
-    def get_parsing_candidate(cls, node):
-        return ParsingCandidate(None, raw_html=html)
+    def get_parsing_candidate(cls, node, url=None):
+        key = '%s#%s' % (url, id(node))
+        link_hash = '%s.%s' % (hashlib.md5(key.encode('utf-8')).hexdigest(), time.time())
+        return ParsingCandidate(url, link_hash)
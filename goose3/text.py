@@ -20,6 +20,7 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import functools
 import os
 import re
 import string
@@ -43,32 +44,100 @@ def get_site_domain(text):
     return ""
 
 
+# only the start of the page is scanned for the head, so that a page without
+# a head end is not searched, or decoded, as a whole
+HEAD_SCAN_SIZE = 65536
+HEAD_END = re.compile(r'</head\s*>|<body[\s>]', re.I)
+LINK_TAG = re.compile(r'<link\s[^>]*>', re.I)
+LINK_REL_AMPHTML = re.compile(r'\srel\s*=\s*["\']?amphtml["\'\s/>]', re.I)
+LINK_HREF = re.compile(r'\shref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+
+
+def get_amphtml_link(content):
+    """
+    Return the href of the `<link rel="amphtml">` of the document head
+    without parsing the document, or None.
+    :param content: string or bytes of the html document.
+    """
+    content = content[:HEAD_SCAN_SIZE]
+    if isinstance(content, bytes):
+        content = content.decode('latin-1')
+    match = HEAD_END.search(content)
+    head = content[:match.start()] if match else content
+    for link in LINK_TAG.findall(head):
+        if LINK_REL_AMPHTML.search(link):
+            href = LINK_HREF.search(link)
+            if href:
+                return next(group for group in href.groups() if group is not None).strip() or None
+    return None
+
+
+CONTENT_TYPE_CHARSET = re.compile(r'charset\s*=\s*["\']?([a-z0-9\-_:.]+)', re.I)
+
+
+def get_encoding_from_headers(headers):
+    """
+    Return the charset declared by the Content-Type header, or None; unlike
+    requests no default is assumed when the header has no charset.
+    :param headers: mapping of the HTTP response headers.
+    """
+    if not headers:
+        return None
+    for name, value in headers.items():
+        if name.lower() == 'content-type' and value:
+            match = CONTENT_TYPE_CHARSET.search(value)
+            return match.group(1) if match else None
+    return None
+
+
+# the html spec expects the encoding declaration within the first 1024 bytes;
+# be more lenient as many pages have large heads
+CHARSET_SNIFF_SIZE = 8192
+FIND_CHARSET = re.compile(r'<meta[^>]*?charset=["\']*([a-z0-9\-_]+?) *?["\'>]', flags=re.I)
+FIND_CHARSET_BYTES = re.compile(br'<meta[^>]*?charset=["\']*([a-z0-9\-_]+?) *?["\'>]', flags=re.I)
+FIND_XML = re.compile(r'^<\?xml[^>]*?encoding=["\']*([a-z0-9\-_]+?) *?["\'>]')
+FIND_XML_BYTES = re.compile(br'^<\?xml[^>]*?encoding=["\']*([a-z0-9\-_]+?) *?["\'>]')
+
+
 def get_encodings_from_content(content):
     """
     Code from:
     https://github.com/sigmavirus24/requests-toolbelt/blob/master/requests_toolbelt/utils/deprecated.py
     Return encodings from given content string.
+    Only the first CHARSET_SNIFF_SIZE characters (or bytes) are looked at.
     :param content: string to extract encodings from.
     """
+    return list(_sniff_encodings(content[:CHARSET_SNIFF_SIZE]))
+
+
+@functools.lru_cache(maxsize=32)
+def _sniff_encodings(head):
+    # the same page is sniffed by the crawler, the parser and the metas
+    # extractor; the cache is keyed by the bounded head only
+    if isinstance(head, bytes):
+        return tuple(encoding.decode('utf-8') for encoding in
+                     FIND_CHARSET_BYTES.findall(head) + FIND_XML_BYTES.findall(head))
+    return tuple(FIND_CHARSET.findall(head) + FIND_XML.findall(head))
+
+
+# comments and the bodies of script (except json-ld), style, noscript and svg
+# elements; a script body ends at the first closing tag just like in the parser
+STRIP_ELEMENTS = (r'<!--.*?-->'
+                  r'|<script(?![^>]*application/ld\+json)(?:\s[^>]*)?>.*?</script\s*>'
+                  r'|<(style|noscript|svg)(?:\s[^>]*)?>.*?</\1\s*>')
+FIND_STRIP_ELEMENTS = re.compile(STRIP_ELEMENTS, flags=re.I | re.S)
+FIND_STRIP_ELEMENTS_BYTES = re.compile(STRIP_ELEMENTS.encode('ascii'), flags=re.I | re.S)
+
+
+def strip_scripts_styles(content):
+    """
+    Drop comments, scripts, styles, noscript and svg elements from the raw
+    html before it is parsed; json-ld scripts are kept.
+    :param content: html string or bytes.
+    """
     if isinstance(content, bytes):
-        find_charset = re.compile(
-            br'<meta.*?charset=["\']*([a-z0-9\-_]+?) *?["\'>]', flags=re.I
-        ).findall
-
-        find_xml = re.compile(
-            br'^<\?xml.*?encoding=["\']*([a-z0-9\-_]+?) *?["\'>]'
-        ).findall
-        return [encoding.decode('utf-8') for encoding in
-                find_charset(content) + find_xml(content)]
-    else:
-        find_charset = re.compile(
-            r'<meta.*?charset=["\']*([a-z0-9\-_]+?) *?["\'>]', flags=re.I
-        ).findall
-
-        find_xml = re.compile(
-            r'^<\?xml.*?encoding=["\']*([a-z0-9\-_]+?) *?["\'>]'
-        ).findall
-        return find_charset(content) + find_xml(content)
+        return FIND_STRIP_ELEMENTS_BYTES.sub(b'', content)
+    return FIND_STRIP_ELEMENTS.sub('', content)
 
 
 def innerTrim(value):
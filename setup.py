@@ -79,6 +79,7 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=dependencies,
+    extras_require={'numpy': ['numpy']},
     test_requires=test_dependencies,
     test_suite="tests"
 )
@@ -22,7 +22,12 @@ limitations under the License.
 """
 
 import unittest
+from unittest import mock
+
+from goose3 import Goose
 from goose3.article import Article
+from goose3.crawler import Crawler
+from goose3.parsers import Parser
 
 
 class TestArticle(unittest.TestCase):
@@ -30,3 +35,49 @@ class TestArticle(unittest.TestCase):
     def test_instance(self):
         a = Article()
         self.assertEqual(isinstance(a, Article), True)
+
+    def test_raw_doc_is_parsed_on_demand(self):
+        html = ('<html><head><script>var a = 1;</script></head><body><p>This is the article text '
+                'that is long enough to be extracted by goose as the content.</p></body></html>')
+        with Goose() as g:
+            article = g.extract(raw_html=html)
+        self.assertIsNone(article._raw_doc)
+        raw_doc = article.raw_doc
+        self.assertEqual(len(raw_doc.xpath('//script')), 1)
+        self.assertIs(article.raw_doc, raw_doc)
+        self.assertEqual(len(article.doc.xpath('//script')), 0)
+
+    def test_raw_doc_loader_does_not_keep_the_crawler(self):
+        html = ('<html><body><p>This is the article text that is long enough to be extracted by '
+                'goose as the content.</p></body></html>')
+        with Goose() as g:
+            article = g.extract(raw_html=html)
+        loader = article._raw_doc_loader
+        self.assertNotIsInstance(getattr(loader.func, '__self__', None), Crawler)
+        self.assertFalse(any(isinstance(arg, Crawler) for arg in loader.args))
+
+    def test_extract_from_parsed_doc(self):
+        html = ('<html><head><title>The title</title></head><body><div><p>This is the article text '
+                'that is long enough to be extracted by goose as the content.</p></div></body></html>')
+        with Goose() as g:
+            expected = g.extract(raw_html=html)
+            doc = Parser.fromstring(html)
+            with mock.patch.object(Parser, 'fromstring') as fromstring:
+                article = g.extract(url='http://example.com/article', doc=doc)
+            fromstring.assert_not_called()
+        self.assertEqual(article.title, expected.title)
+        self.assertEqual(article.cleaned_text, expected.cleaned_text)
+        self.assertEqual(article.final_url, 'http://example.com/article')
+        # the tree of the caller is cleaned in place
+        self.assertIs(article.doc, doc)
+
+    def test_strip_scripts_keeps_json_ld(self):
+        html = ('<html><head><script>var a = 1;</script><script type="application/ld+json">'
+                '{"@context": "http://schema.org", "@type": "NewsArticle", "headline": "The headline"}'
+                '</script></head><body><p>This is the article text that is long enough to be '
+                'extracted by goose as the content.</p></body></html>')
+        with Goose({'strip_scripts': True}) as g:
+            article = g.extract(raw_html=html)
+        self.assertEqual(article.json_ld['headline'], 'The headline')
+        self.assertEqual(article.schema['headline'], 'The headline')
+        self.assertEqual(len(article.raw_doc.xpath('//script')), 1)
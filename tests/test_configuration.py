@@ -25,6 +25,12 @@ import tempfile
 import unittest
 
 from goose3 import Goose
+from goose3.configuration import ArticleContextPattern, Configuration
+from goose3.crawler import Crawler
+from goose3.cleaners import StandardDocumentCleaner
+from goose3.extractors.content import ContentExtractor, StandardContentExtractor
+from goose3.outputformatters import StandardOutputFormatter
+from goose3.parsers import Parser
 
 
 class TestTempDir(unittest.TestCase):
@@ -38,3 +44,68 @@ class TestTempDir(unittest.TestCase):
         path = '/tmp/goose'
         g = Goose({'local_storage_path': path})
         self.assertEqual(g.config.local_storage_path, path)
+
+
+class TestPipelineClasses(unittest.TestCase):
+
+    def test_defaults(self):
+        crawler = Crawler(Configuration())
+        self.assertIs(type(crawler.extractor), StandardContentExtractor)
+        self.assertIs(type(crawler.cleaner), StandardDocumentCleaner)
+        self.assertIs(type(crawler.formatter), StandardOutputFormatter)
+
+    def test_custom_extractor(self):
+        class LastDivExtractor(ContentExtractor):
+            def calculate_best_node(self, docs):
+                return self.parser.getElementsByTag(docs[0], tag='div')[-1]
+
+        html = ('<html><body><div><p>The first part of the article is in here and it is long.</p></div>'
+                '<div><p>The second part of the article is in there and it is longer.</p></div></body></html>')
+        with Goose({'extractor_class': LastDivExtractor}) as g:
+            article = g.extract(raw_html=html)
+        self.assertEqual(article.top_node.getprevious().tag, 'div')
+        self.assertTrue(article.cleaned_text.endswith('The second part of the article is in there and it is longer.'))
+
+    def test_invalid_class(self):
+        config = Configuration()
+        with self.assertRaises(ValueError):
+            config.extractor_class = StandardOutputFormatter
+        with self.assertRaises(ValueError):
+            config.cleaner_class = 'StandardDocumentCleaner'
+        with self.assertRaises(ValueError):
+            config.formatter_class = StandardContentExtractor
+
+
+class TestContextPatterns(unittest.TestCase):
+
+    html = ('<html><body><div class="Main-Story" id="story"><p>One</p></div>'
+            '<article class="post-content"><p>Two</p></article>'
+            '<section class="site-body"><p>Three</p></section></body></html>')
+
+    def test_nodes_in_pattern_order(self):
+        config = Configuration()
+        config.known_context_patterns = [
+            ArticleContextPattern(tag='section'),
+            ArticleContextPattern(attr='class', value='main-story'),
+            ArticleContextPattern(attr='class', value='site-body', domain='example.com'),
+            ArticleContextPattern(xpath='descendant::*[@id="story"]'),
+        ]
+        doc = Parser.fromstring(self.html)
+        nodes = config.get_context_patterns('example.com').find(Parser, doc)
+        self.assertEqual([(node.tag, Parser.getText(node)) for node in nodes],
+                         [('section', 'Three'), ('div', 'One'), ('section', 'Three'), ('div', 'One'),
+                          ('article', 'Two'), ('article', 'Two'), ('article', 'Two')])
+        nodes = config.get_context_patterns('other.com').find(Parser, doc)
+        self.assertEqual([node.tag for node in nodes], ['section', 'div', 'div', 'article', 'article', 'article'])
+
+    def test_index_follows_the_patterns(self):
+        config = Configuration()
+        patterns = config.get_context_patterns('example.com')
+        self.assertIs(config.get_context_patterns('other.com'), patterns)
+        config.known_context_patterns = ArticleContextPattern(attr='class', value='site-body', domain='example.com')
+        self.assertIsNot(config.get_context_patterns('example.com'), patterns)
+        self.assertIs(config.get_context_patterns('other.com').patterns[0], config.known_context_patterns[1])
+        self.assertTrue(config.get_context_patterns('example.com').is_articlebody(
+            Parser, Parser.fromstring('<section class="site-body"></section>')))
+        self.assertFalse(config.get_context_patterns('other.com').is_articlebody(
+            Parser, Parser.fromstring('<section class="site-body"></section>')))
@@ -22,13 +22,29 @@ limitations under the License.
 """
 from __future__ import absolute_import
 
-from .test_base import TestExtractionBase
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from .test_base import CURRENT_PATH, TestExtractionBase
 
 from goose3 import ArticleContextPattern
+from goose3.text import StopWords
 from goose3.text import StopWordsChinese
 from goose3.text import StopWordsArabic
 from goose3.text import StopWordsKorean
 from goose3.crawler import Crawler, CrawlCandidate
+from goose3.parsers import Parser, ParserXML
+from goose3.article import Article
+from goose3.outputformatters import StandardOutputFormatter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class TestExtractions(TestExtractionBase):
 
@@ -587,8 +603,187 @@ class TestSubArticleExtraction(TestExtractionBase):
         article = self.getArticle()
         self.assertTrue(len(article.sub_articles) > 0)
 
+    def test_sub_articles_reuse_parsed_subtree(self):
+        config = self.getConfig()
+        raw_html = """
+            <html><body>
+                <article><h2>First story</h2><p>The first story is about cats.</p></article>
+                <article><h2>Second story</h2><p>The second story is about dogs.</p></article>
+            </body></html>
+        """
+        crawler = Crawler(config)
+        with mock.patch.object(Crawler, 'get_document', wraps=crawler.get_document) as get_document:
+            article = crawler.crawl(CrawlCandidate(config, None, raw_html))
+        # only the page itself is parsed
+        self.assertEqual(get_document.call_count, 1)
+        self.assertEqual(len(article.sub_articles), 1)
+        sub_article = article.sub_articles[0]
+        self.assertEqual(sub_article.crawled_article.doc.tag, 'article')
+        self.assertIn('dogs', sub_article.cleaned_text)
+
     def test_newslocker(self):
         article = self.getArticle()
         fields = ["title", 'read_more_url']
         self.runArticleAssertions(article=article, fields=fields)
         self.assertTrue(len(article.sub_articles)> 0)
+
+
+class TestContentScoring(TestExtractionBase):
+
+    def test_node_stats_are_computed_once(self):
+        config = self.getConfig()
+        paragraphs = ['<p>This is paragraph number %d of the article and it is about the things that matter.</p>' % i
+                      for i in range(20)]
+        raw_html = '<html><body><div>%s</div></body></html>' % ''.join(paragraphs)
+        crawler = Crawler(config)
+        with mock.patch.object(StopWords, 'get_stopword_count', autospec=True,
+                               side_effect=StopWords.get_stopword_count) as get_stopword_count:
+            article = crawler.crawl(CrawlCandidate(config, None, raw_html), crawl_sub=False)
+        self.assertTrue(article.cleaned_text.startswith('This is paragraph number 0'))
+        texts = [call[0][1] for call in get_stopword_count.call_args_list]
+        self.assertEqual(len(texts), len(set(texts)))
+
+    def test_deep_tree(self):
+        config = self.getConfig()
+        doc = Parser.fromstring('<html><body></body></html>')
+        parent = doc.find('body')
+        for _ in range(sys.getrecursionlimit() + 100):
+            child = Parser.createElement(tag='div')
+            Parser.appendChild(parent, child)
+            parent = child
+        for i in range(5):
+            Parser.appendChild(parent, Parser.createElement(
+                tag='p', text='This is paragraph number %d of the article and it is about the things that matter.' % i))
+        crawler = Crawler(config)
+        article = crawler.crawl(CrawlCandidate(config, None, None, doc=doc), crawl_sub=False)
+        self.assertIs(article.top_node, parent)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_scoring_backend(self):
+        paragraphs = ['<p>This is paragraph number %d of the article and it is about the things that matter.</p>' % i
+                      for i in range(40)]
+        raw_html = ('<html><body><div><p>Short caption</p>%s</div><div><p>%s</p><p>%s</p></div></body></html>' %
+                    (''.join(paragraphs), 'This is the aside and it is about another thing.',
+                     'It is not as long as the article.'))
+        results = []
+        for backend in ('python', 'numpy'):
+            config = self.getConfig()
+            config.scoring_backend = backend
+            crawler = Crawler(config)
+            article = crawler.crawl(CrawlCandidate(config, None, raw_html), crawl_sub=False)
+            tree = article.doc.getroottree()
+            results.append((tree.getpath(article.top_node),
+                            {tree.getpath(node): score for node, score in article._node_scores.items()},
+                            {tree.getpath(node): count for node, count in crawler.extractor.node_counts.items()}))
+        self.assertEqual(results[0], results[1])
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_is_imported_lazily(self):
+        code = 'import sys, goose3; print("numpy" in sys.modules)'
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(CURRENT_PATH),
+                                         universal_newlines=True)
+        self.assertEqual(output.strip(), 'False')
+
+    def test_link_density(self):
+        config = self.getConfig()
+        raw_html = (
+            '<html><body><div>'
+            '<p>This paragraph has one <a href="/a">link</a> among many words of text.</p>'
+            '<ul><li><a href="/b">first link</a></li><li><a href="/c">second link</a></li></ul>'
+            '<p>No links here</p>'
+            '</div></body></html>')
+        crawler = Crawler(config)
+        crawler.crawl(CrawlCandidate(config, None, raw_html), crawl_sub=False)
+        extractor = crawler.extractor
+        doc = crawler.article.doc
+        para, links_list, no_links = Parser.css_select(doc, 'div > *')
+        self.assertFalse(extractor.is_highlink_density(para))
+        self.assertTrue(extractor.is_highlink_density(links_list))
+        self.assertFalse(extractor.is_highlink_density(no_links))
+        self.assertEqual(extractor.get_link_stats(links_list), (2, 2))
+
+    def test_table_and_no_para_exist(self):
+        config = self.getConfig()
+        crawler = Crawler(config)
+        crawler.crawl(CrawlCandidate(config, None, '<html><body><p>Text</p></body></html>'), crawl_sub=False)
+        extractor = crawler.extractor
+        short = Parser.fromstring('<div><p>Short</p><p>Short as well</p></div>')
+        kept = Parser.fromstring('<div><p>Short</p><div><p>This paragraph is long enough to be kept.</p></div></div>')
+        with mock.patch.object(Parser, 'getElementsByTag', wraps=Parser.getElementsByTag) as get_elements:
+            self.assertTrue(extractor.is_table_and_no_para_exist(short))
+            self.assertFalse(extractor.is_table_and_no_para_exist(kept))
+        self.assertEqual(get_elements.call_count, 2)
+        self.assertEqual(Parser.getText(kept), 'This paragraph is long enough to be kept.')
+
+    def test_candidate_nodes(self):
+        config = self.getConfig()
+        raw_html = ('<html><body><table><tr><td>Cell</td></tr></table><pre>Code</pre>'
+                    '<div><p>Short</p></div><p>Too short</p></body></html>')
+        crawler = Crawler(config)
+        with mock.patch.object(Parser, 'xpath_re', wraps=Parser.xpath_re) as xpath_re:
+            article = crawler.crawl(CrawlCandidate(config, None, raw_html), crawl_sub=False)
+        # the fallback on the whole document reuses the nodes found the first time
+        self.assertEqual(len([call for call in xpath_re.call_args_list if 'self::pre' in call[0][1]]), 1)
+        self.assertIs(article.top_node, article.doc)
+        nodes = crawler.extractor.nodes_to_check([article.doc])
+        self.assertEqual([Parser.getText(node) for node in nodes], ['Short', 'Too short', 'Code', 'Cell'])
+
+    def test_max_candidate_nodes(self):
+        config = self.getConfig()
+        config.max_candidate_nodes = 2
+        raw_html = ('<html><body><p>Short</p><p>The longest paragraph</p><p>Tiny</p>'
+                    '<p>A longer paragraph</p></body></html>')
+        crawler = Crawler(config)
+        article = crawler.crawl(CrawlCandidate(config, None, raw_html), crawl_sub=False)
+        nodes = crawler.extractor.nodes_to_check([article.doc])
+        self.assertEqual([Parser.getText(node) for node in nodes], ['The longest paragraph', 'A longer paragraph'])
+
+    def test_negative_scores_keep_output(self):
+        for parser_class, kept in (('html', True), ('soup', True), ('xml', False)):
+            config = self.getConfig()
+            config.parser_class = parser_class
+            parser = config.get_parser()
+            doc = parser.fromstring('<html><body><div><p>Kept</p><p>Scored below one</p></div></body></html>')
+            top_node = parser.getElementsByTag(doc, tag='div')[0]
+            article = Article()
+            article._node_scores[parser.getChildren(top_node)[1]] = -5
+            formatter = StandardOutputFormatter(config, article)
+            formatter.top_node = top_node
+            formatter.remove_negativescores_nodes()
+            self.assertEqual(len(parser.getChildren(top_node)) == 2, kept, parser_class)
+
+        # a parser using the xml translator does not drop them unless it asks to
+        class XMLTranslatorParser(Parser):
+            css_translator = 'xml'
+        doc = XMLTranslatorParser.fromstring('<html><body><div><p>Kept</p><p>Scored below one</p></div></body></html>')
+        top_node = XMLTranslatorParser.getElementsByTag(doc, tag='div')[0]
+        article = Article()
+        article._node_scores[XMLTranslatorParser.getChildren(top_node)[1]] = -5
+        formatter = StandardOutputFormatter(config, article)
+        formatter.parser = XMLTranslatorParser
+        formatter.top_node = top_node
+        formatter.remove_negativescores_nodes()
+        self.assertEqual(len(XMLTranslatorParser.getChildren(top_node)), 2)
+
+        # the tail of a dropped node is kept and the top node is never dropped
+        doc = ParserXML.fromstring('<html><body><div><p>Kept</p><p>Scored below one</p>Tail</div></body></html>')
+        top_node = ParserXML.getElementsByTag(doc, tag='div')[0]
+        article = Article()
+        article._node_scores[top_node] = -1
+        article._node_scores[ParserXML.getChildren(top_node)[1]] = -5
+        formatter = StandardOutputFormatter(config, article)
+        formatter.top_node = top_node
+        formatter.remove_negativescores_nodes()
+        self.assertEqual(ParserXML.getText(top_node), 'Kept Tail')
+
+    def test_sibling_walk_stops_early(self):
+        config = self.getConfig()
+        paragraphs = ['<p>This is paragraph number %d of the article and it is about the things that matter.</p>' % i
+                      for i in range(500)]
+        raw_html = '<html><body><div>%s</div></body></html>' % ''.join(paragraphs)
+        crawler = Crawler(config)
+        article = crawler.crawl(CrawlCandidate(config, None, raw_html), crawl_sub=False)
+        last = Parser.getElementsByTag(article.doc, tag='p')[-1]
+        with mock.patch.object(Parser, 'previousSibling', wraps=Parser.previousSibling) as previous_sibling:
+            self.assertTrue(crawler.extractor.is_boostable(last))
+        self.assertEqual(previous_sibling.call_count, 1)
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""\
+This is a python port of "Goose" orignialy licensed to Gravity.com
+under one or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.
+
+Python port was written by Xavier Grangier for Recrutae
+
+Gravity.com licenses this file
+to you under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from copy import copy
+from unittest import mock
+
+import requests_mock
+
+import goose3.text
+from goose3 import Goose
+from goose3.configuration import Configuration
+from goose3.network import NetworkFetcher
+from goose3.parsers import Parser, ParserSoup, ParserXML
+
+CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestNetworkFetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.fetcher = NetworkFetcher(Configuration())
+
+    def tearDown(self):
+        self.fetcher.close()
+
+    def test_concurrent_requests_are_coalesced(self):
+        url = 'http://example.com/logo.png'
+        release = threading.Event()
+
+        def slow_body(request, context):
+            release.wait(5)
+            return b'image-bytes'
+
+        results = []
+
+        def worker():
+            results.append(self.fetcher.fetch(url))
+
+        with requests_mock.Mocker() as m:
+            m.get(url, content=slow_body)
+            threads = [threading.Thread(target=worker) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.2)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(results, [b'image-bytes'] * 5)
+        self.assertEqual(self.fetcher._in_flight, {})
+
+    def test_sequential_requests_are_not_coalesced(self):
+        url = 'http://example.com/article.html'
+        with requests_mock.Mocker() as m:
+            m.get(url, text='<html></html>')
+            self.fetcher.fetch(url)
+            self.fetcher.fetch(url)
+            self.assertEqual(m.call_count, 2)
+
+    def test_failed_request_is_released(self):
+        url = 'http://example.com/broken'
+        with requests_mock.Mocker() as m:
+            m.get(url, exc=ValueError('boom'))
+            with self.assertRaises(ValueError):
+                self.fetcher.fetch(url)
+        self.assertEqual(self.fetcher._in_flight, {})
+
+
+class TestFetchArchive(unittest.TestCase):
+
+    html = (
+        '<html><head><meta charset="utf-8"><title>Archived</title></head><body>'
+        '<p>This is the article body and it has to be long enough to be picked up by the '
+        'extractor, it is here for the purpose of the test of the archive.</p></body></html>'
+    )
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def get_config(self, mode):
+        config = Configuration()
+        config.http_archive_path = self.path
+        config.http_archive_mode = mode
+        return config
+
+    def test_record_and_replay(self):
+        url = 'http://example.com/article.html'
+        with requests_mock.Mocker() as m:
+            m.get(url, content=self.html.encode('utf-8'),
+                  headers={'Content-Type': 'text/html; charset=utf-8'})
+            with Goose(self.get_config('record')) as g:
+                recorded = g.extract(url=url)
+
+        # no mocker here: any real network access would fail
+        with Goose(self.get_config('replay')) as g:
+            replayed = g.extract(url=url)
+
+        self.assertEqual(recorded.title, 'Archived')
+        self.assertEqual(replayed.title, recorded.title)
+        self.assertEqual(replayed.cleaned_text, recorded.cleaned_text)
+        self.assertEqual(replayed.meta_encoding, recorded.meta_encoding)
+
+    def test_replay_stream_parsing(self):
+        url = 'http://example.com/article.html'
+        with requests_mock.Mocker() as m:
+            m.get(url, content=self.html.encode('utf-8'),
+                  headers={'Content-Type': 'text/html; charset=utf-8'})
+            with Goose(self.get_config('record')) as g:
+                recorded = g.extract(url=url)
+
+        config = self.get_config('replay')
+        config.stream_parsing = True
+        with Goose(config) as g:
+            replayed = g.extract(url=url)
+        self.assertEqual(replayed.title, recorded.title)
+        self.assertEqual(replayed.cleaned_text, recorded.cleaned_text)
+
+    def test_replay_missing_url(self):
+        config = self.get_config('replay')
+        config.strict = False
+        fetcher = NetworkFetcher(config)
+        self.assertIsNone(fetcher.fetch('http://example.com/missing.png'))
+        self.assertEqual(fetcher.fetch_obj('http://example.com/missing.png').status_code, 404)
+
+    def test_replayed_body_is_consumed(self):
+        url = 'http://example.com/article.html'
+        with requests_mock.Mocker() as m:
+            m.get(url, content=self.html.encode('utf-8'))
+            NetworkFetcher(self.get_config('record')).fetch(url)
+        response = NetworkFetcher(self.get_config('replay')).fetch_obj(url)
+        self.assertEqual(b''.join(response.iter_content(16)), self.html.encode('utf-8'))
+        response.close()
+
+    def test_mode_without_path(self):
+        config = Configuration()
+        config.http_archive_mode = 'record'
+        with requests_mock.Mocker() as m:
+            with self.assertRaises(ValueError):
+                NetworkFetcher(config)
+            self.assertEqual(m.call_count, 0)
+
+    def test_invalid_mode(self):
+        config = Configuration()
+        with self.assertRaises(ValueError):
+            config.http_archive_mode = 'rewind'
+
+
+class TestStreamParsing(unittest.TestCase):
+
+    def test_streamed_extraction_matches(self):
+        path = os.path.join(CURRENT_PATH, 'data', 'content', 'test_cnn1.html')
+        with open(path, 'rb') as fobj:
+            content = fobj.read()
+        url = 'http://example.com/cnn1.html'
+
+        articles = []
+        for stream_parsing in [False, True]:
+            with requests_mock.Mocker() as m:
+                m.get(url, content=content, headers={'Content-Type': 'text/html'})
+                with Goose({'stream_parsing': stream_parsing}) as g:
+                    articles.append(g.extract(url=url))
+
+        article, streamed = articles
+        self.assertEqual(streamed.title, article.title)
+        self.assertEqual(streamed.cleaned_text, article.cleaned_text)
+        self.assertEqual(streamed.raw_html, content.decode('utf-8'))
+
+
+class TestBytesFirst(unittest.TestCase):
+
+    html = (
+        '<html><head><title>Caf\xe9 cr\xe8me</title></head><body>'
+        '<p>Le caf\xe9 cr\xe8me est une boisson \xe0 base de caf\xe9 et de cr\xe8me, et ce '
+        'paragraphe est assez long pour \xeatre le contenu de la page.</p></body></html>'
+    )
+
+    def test_raw_bytes(self):
+        with Goose({'target_language': 'fr', 'use_meta_language': False}) as g:
+            article = g.extract(raw_html=self.html)
+            from_bytes = g.extract(raw_bytes=self.html.encode('cp1252'),
+                                   headers={'Content-Type': 'text/html; charset=windows-1252'})
+        self.assertEqual(from_bytes.title, 'Caf\xe9 cr\xe8me')
+        self.assertEqual(from_bytes.title, article.title)
+        self.assertEqual(from_bytes.cleaned_text, article.cleaned_text)
+
+    def test_raw_bytes_without_headers(self):
+        html = self.html.replace('<head>', '<head><meta charset="utf-8">')
+        with Goose() as g:
+            article = g.extract(raw_bytes=html.encode('utf-8'))
+        self.assertEqual(article.title, 'Caf\xe9 cr\xe8me')
+
+    def test_bytes_without_charset(self):
+        # nothing is declared, the encoding is left to lxml to detect
+        with Goose() as g:
+            from_bytes = g.extract(raw_bytes=self.html.encode('cp1252'))
+            article = g.extract(raw_html=self.html.encode('cp1252'))
+        self.assertEqual(from_bytes.title, 'Caf\xe9 cr\xe8me')
+        self.assertEqual(article.title, 'Caf\xe9 cr\xe8me')
+
+    def test_fetch_bytes_first(self):
+        url = 'http://example.com/cafe.html'
+        with requests_mock.Mocker() as m:
+            m.get(url, content=self.html.encode('cp1252'),
+                  headers={'Content-Type': 'text/html; charset=windows-1252'})
+            with Goose({'bytes_first': True}) as g:
+                article = g.extract(url=url)
+        self.assertEqual(article.title, 'Caf\xe9 cr\xe8me')
+        self.assertEqual(article.raw_html, self.html.encode('cp1252'))
+
+    def test_fetch_sniffs_charset_once(self):
+        url = 'http://example.com/cafe.html'
+        html = self.html.replace('<head>', '<head><meta charset="windows-1252">')
+        with requests_mock.Mocker() as m:
+            m.get(url, content=html.encode('cp1252'), headers={'Content-Type': 'text/html'})
+            with Goose() as g:
+                with mock.patch('goose3.text._sniff_encodings', wraps=goose3.text._sniff_encodings) as sniff:
+                    article = g.extract(url=url)
+        self.assertEqual(sniff.call_count, 1)
+        self.assertEqual(article.title, 'Caf\xe9 cr\xe8me')
+        self.assertEqual(article.meta_encoding, 'windows-1252')
+
+
+class TestParserFallback(unittest.TestCase):
+
+    html = ('<html><head><title>The title</title></head><body><div><p>This is the article text '
+            'that is long enough to be extracted by goose as the content.</p></div></body></html>')
+
+    def test_fallback_reuses_fetched_html(self):
+        url = 'http://example.com/article.html'
+        with requests_mock.Mocker() as m:
+            m.get(url, text=self.html)
+            with Goose() as g:
+                with mock.patch.object(Parser, 'fromstring', side_effect=ValueError('broken')):
+                    article = g.extract(url=url)
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(article.title, 'The title')
+        self.assertTrue(article.cleaned_text.startswith('This is the article text'))
+
+    def test_fallback_configs_are_lazy(self):
+        with Goose() as g:
+            with mock.patch('goose3.copy', side_effect=copy) as config_copy:
+                article = g.extract(raw_html=self.html)
+        self.assertEqual(config_copy.call_count, 0)
+        self.assertEqual(article.title, 'The title')
+
+    def test_fallback_exhausted(self):
+        with Goose() as g:
+            with mock.patch.object(Parser, 'fromstring', side_effect=ValueError('broken')), \
+                    mock.patch.object(ParserXML, 'fromstring', side_effect=ValueError('broken')), \
+                    mock.patch.object(ParserSoup, 'fromstring', side_effect=ValueError('broken')):
+                self.assertRaises(ValueError, g.extract, raw_html=self.html)
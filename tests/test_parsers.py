@@ -21,16 +21,27 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import os
+import threading
+import time
 import unittest
+from unittest import mock
 
+from goose3.configuration import AVAILABLE_PARSERS, Configuration, register_parser
 from goose3.utils import FileHelper
 from goose3.parsers import Parser
 from goose3.parsers import ParserSoup
+from goose3.parsers import ParserXML
 
 CURRENT_PATH = os.path.dirname(os.path.abspath(__file__))
 
 
 class ParserBase(unittest.TestCase):
+    ''' Conformance suite of the parser primitives; a parser registered with
+        `goose3.configuration.register_parser` is expected to pass it, e.g.
+        with a subclass whose `setUp` sets `self.parser` '''
+
+    # seconds a primitive may take on a large page
+    time_budget = 2.0
 
     def setUp(self):
         self.parser = Parser
@@ -269,6 +280,131 @@ class ParserBase(unittest.TestCase):
         html += u'</body></html>'
         self.parser.fromstring(html)
 
+    def test_fromchunks(self):
+        html = '<html><head><meta charset="windows-1252"></head><body>'
+        html += '<p>caf\xe9 cr\xe8me</p>' * 50
+        html += '</body></html>'
+        data = html.encode('cp1252')
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        doc = self.parser.fromchunks(chunks)
+        paras = self.parser.getElementsByTag(doc, tag='p')
+        self.assertEqual(len(paras), 50)
+        self.assertEqual(self.parser.getText(paras[0]), 'caf\xe9 cr\xe8me')
+
+        # header charset wins over the sniffed one
+        data = html.replace('windows-1252', 'ascii').encode('utf-8')
+        doc = self.parser.fromchunks([data], encoding='utf-8')
+        self.assertEqual(self.parser.getText(self.parser.getElementsByTag(doc, tag='p')[0]), 'caf\xe9 cr\xe8me')
+
+    def test_resources_are_cached(self):
+        self.assertIs(self.parser.compile_xpath('//p'), self.parser.compile_xpath('//p'))
+        self.assertEqual(self.parser.translate_css('p > a'), self.parser.translate_css('p > a'))
+        self.assertIs(self.parser.get_html_parser('utf-8'), self.parser.get_html_parser('utf-8'))
+        # parser objects are not shared between threads
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.parser.get_html_parser('utf-8')))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], self.parser.get_html_parser('utf-8'))
+
+        # comments can still be queried
+        doc = self.parser.fromstring('<html><body><!-- note --><p>text</p></body></html>')
+        comment = self.parser.getComments(doc)[0]
+        self.assertEqual(self.parser.getElementsByTag(comment, tag='p'), [])
+
+    def test_text_cache(self):
+        html = '<html><body><div><p>first <b>bold</b></p><p>second</p></div></body></html>'
+        doc = self.parser.fromstring(html)
+        div = self.parser.getElementsByTag(doc, tag='div')[0]
+        with self.parser.text_cache():
+            self.assertEqual(self.parser.getText(div), 'first bold second')
+            with mock.patch.object(self.parser, 'build_text') as build_text:
+                self.assertEqual(self.parser.getText(div), 'first bold second')
+            build_text.assert_not_called()
+
+            # the mutation helpers invalidate the changed nodes
+            para = self.parser.getElementsByTag(doc, tag='p')[0]
+            self.assertEqual(self.parser.getText(para), 'first bold')
+            self.parser.stripTags(div, 'b')
+            self.parser.remove(self.parser.getElementsByTag(doc, tag='p')[1])
+            self.assertEqual(self.parser.getText(div), 'first bold')
+            self.assertEqual(self.parser.getText(para), 'first bold')
+            self.parser.drop_tag(para)
+            self.assertEqual(self.parser.getText(div), 'first bold')
+            self.assertEqual(self.parser.getText(doc), 'first bold')
+
+    def test_primitives(self):
+        html = '<html><head><title>Title</title></head><body>'
+        html += '<!-- comment --><div id="main" class="content">intro '
+        html += '<p class="first">first <a href="http://example.com">link</a></p> tail'
+        html += '<p>second</p><p>third</p></div></body></html>'
+        doc = self.parser.fromstring(html)
+        div = self.parser.getElementById(doc, 'main')
+        self.assertEqual(self.parser.getTag(div), 'div')
+        self.assertIsNone(self.parser.getElementById(doc, 'missing'))
+        self.assertEqual(self.parser.getText(div), 'intro first link tail second third')
+        self.assertEqual(self.parser.getAttribute(div, 'class'), 'content')
+        self.assertIsNone(self.parser.getAttribute(div, 'missing'))
+        self.parser.setAttribute(div, 'data-score', '1')
+        self.assertEqual(self.parser.getAttribute(div, 'data-score'), '1')
+        self.assertEqual(len(self.parser.getComments(doc)), 1)
+        self.assertEqual(len(self.parser.xpath_re(doc, '//p[re:test(@class, "^fir", "i")]')), 1)
+        self.assertEqual(len(self.parser.getElementsByXPath(doc, '//p')), 3)
+
+        paras = self.parser.getElementsByTag(div, tag='p')
+        self.assertEqual([self.parser.getTag(elm) for elm in self.parser.iterPostOrder(div)],
+                         ['a', 'p', 'p', 'p', 'div'])
+        self.assertIs(self.parser.getParent(paras[0]), div)
+        self.assertEqual(len(self.parser.getChildren(div)), 3)
+        self.assertEqual(len(self.parser.childNodes(div)), 3)
+        self.assertIs(self.parser.nextSibling(paras[0]), paras[1])
+        self.assertIs(self.parser.previousSibling(paras[1]), paras[0])
+        self.assertIsNone(self.parser.previousSibling(paras[0]))
+        self.assertEqual(self.parser.previousSiblings(paras[2]), [paras[1], paras[0]])
+        self.assertEqual(self.parser.outerHtml(paras[0]),
+                         '<p class="first">first <a href="http://example.com">link</a></p>')
+
+        # the tail of a removed node is kept
+        self.parser.remove(paras[0])
+        self.assertEqual(self.parser.getText(div), 'intro tail second third')
+
+        elm = self.parser.createElement(tag='p', text='fourth')
+        self.parser.appendChild(div, elm)
+        self.assertEqual(self.parser.getText(div), 'intro tail second third fourth')
+
+        childs = self.parser.childNodesWithText(div)
+        self.assertTrue(self.parser.isTextNode(childs[0]))
+        self.assertEqual(childs[0].text, 'intro   tail')
+
+        node = self.parser.stringToNode('<p>para</p>')
+        self.assertEqual(self.parser.getText(node), 'para')
+        self.assertEqual(self.parser.getText(self.parser.textToPara('para')), 'para')
+
+    def test_frombytes(self):
+        html = '<html><head><meta charset="windows-1252"></head><body><p>caf\xe9</p></body></html>'
+        doc = self.parser.frombytes(html.encode('cp1252'))
+        self.assertEqual(self.parser.getText(self.parser.getElementsByTag(doc, tag='p')[0]), 'caf\xe9')
+        doc = self.parser.frombytes(html.encode('utf-8'), encoding='utf-8')
+        self.assertEqual(self.parser.getText(self.parser.getElementsByTag(doc, tag='p')[0]), 'caf\xe9')
+
+    def test_speed(self):
+        html = self.get_html('content/test_huffingtonPost2.html')
+        primitives = [
+            ('fromstring', lambda doc: self.parser.fromstring(html)),
+            ('getElementsByTag', lambda doc: self.parser.getElementsByTag(doc, tag='p')),
+            ('getElementsByTag attr', lambda doc: self.parser.getElementsByTag(
+                doc, attr='class', value='content')),
+            ('css_select', lambda doc: self.parser.css_select(doc, 'div > p, a[href]')),
+            ('getText', lambda doc: self.parser.getText(doc)),
+            ('nodeToString', lambda doc: self.parser.nodeToString(doc)),
+        ]
+        doc = self.parser.fromstring(html)
+        for name, primitive in primitives:
+            start = time.perf_counter()
+            primitive(doc)
+            elapsed = time.perf_counter() - start
+            self.assertLess(elapsed, self.time_budget, '{} took {:.3f}s'.format(name, elapsed))
+
 
 class TestParser(ParserBase):
     pass
@@ -277,3 +413,33 @@ class TestParser(ParserBase):
 class TestSoupParser(ParserBase):
     def setUp(self):
         self.parser = ParserSoup
+
+
+class TestXMLParser(ParserBase):
+    def setUp(self):
+        self.parser = ParserXML
+
+
+class TestParserRegistry(unittest.TestCase):
+
+    def test_register_parser(self):
+        class CustomParser(Parser):
+            pass
+
+        register_parser('custom', CustomParser)
+        try:
+            config = Configuration()
+            self.assertIn('custom', config.available_parsers)
+            config.parser_class = 'custom'
+            self.assertIs(config.get_parser(), CustomParser)
+        finally:
+            del AVAILABLE_PARSERS['custom']
+
+        self.assertRaises(ValueError, register_parser, 'custom', object)
+        self.assertNotIn('custom', Configuration().available_parsers)
+
+    def test_available_parsers(self):
+        self.assertIs(AVAILABLE_PARSERS['lxml'], Parser)
+        self.assertIs(AVAILABLE_PARSERS['html'], Parser)
+        self.assertIs(AVAILABLE_PARSERS['xml'], ParserXML)
+        self.assertIs(AVAILABLE_PARSERS['soup'], ParserSoup)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""\
+This is a python port of "Goose" orignialy licensed to Gravity.com
+under one or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.
+
+Python port was written by Xavier Grangier for Recrutae
+
+Gravity.com licenses this file
+to you under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import unittest
+from unittest import mock
+
+import requests_mock
+
+from goose3 import Goose
+from goose3.crawler import Crawler
+from goose3.parsers import Parser
+from goose3.resolvers import DomainResolver
+
+
+TWEET_HTML = (
+    '<html><body><p>Check this out '
+    '<a class="twitter-timeline-link" href="http://example.com/story.html">link</a></p>'
+    '</body></html>'
+)
+
+STORY_HTML = (
+    '<html><head><title>The story</title></head><body>'
+    '<p>This is the story that the tweet is linking to, and it is the one that we want to get '
+    'as the article text of the extraction.</p></body></html>'
+)
+
+
+class ShortLinkResolver(DomainResolver):
+
+    def __init__(self):
+        super(ShortLinkResolver, self).__init__(domain='sho.rt')
+
+    def resolve(self, parser, doc, url):
+        links = parser.getElementsByTag(doc, tag='link', attr='rel', value='canonical')
+        return parser.getAttribute(links[0], 'href') if links else None
+
+
+class TestDomainResolvers(unittest.TestCase):
+
+    tweet_url = 'http://twitter.com/someone/status/1'
+    story_url = 'http://example.com/story.html'
+
+    def test_twitter_resolver(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.tweet_url, text=TWEET_HTML)
+            m.get(self.story_url, text=STORY_HTML)
+            with Goose() as g:
+                article = g.extract(url=self.tweet_url)
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual(article.title, 'The story')
+
+    def test_resolvers_disabled(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.tweet_url, text=TWEET_HTML)
+            with Goose({'domain_resolvers': []}) as g:
+                article = g.extract(url=self.tweet_url)
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(article.final_url, self.tweet_url)
+
+    def test_custom_resolver(self):
+        short_url = 'http://sho.rt/abc'
+        with requests_mock.Mocker() as m:
+            m.get(short_url, text='<html><head><link rel="canonical" href="%s"></head></html>' % self.story_url)
+            m.get(self.story_url, text=STORY_HTML)
+            with Goose({'domain_resolvers': [ShortLinkResolver()]}) as g:
+                article = g.extract(url=short_url)
+        self.assertEqual(article.title, 'The story')
+        self.assertEqual(article.final_url, self.story_url)
+
+    def test_unresolved_page_is_parsed_once(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.story_url, text=STORY_HTML)
+            with mock.patch.object(Crawler, 'get_document', autospec=True,
+                                   side_effect=Crawler.get_document) as get_document:
+                with Goose({'domain_resolvers': [DomainResolver(domain='example.com')]}) as g:
+                    article = g.extract(url=self.story_url)
+            self.assertEqual(m.call_count, 1)
+            self.assertEqual(get_document.call_count, 1)
+        self.assertEqual(article.title, 'The story')
+
+    def test_fallback_keeps_resolved_url(self):
+        fromstring = Parser.fromstring
+
+        def broken_story(html, encoding=None):
+            if 'The story' in html:
+                raise ValueError('broken')
+            return fromstring(html, encoding)
+
+        with requests_mock.Mocker() as m:
+            m.get(self.tweet_url, text=TWEET_HTML)
+            m.get(self.story_url, text=STORY_HTML)
+            with mock.patch.object(Parser, 'fromstring', side_effect=broken_story):
+                with Goose() as g:
+                    article = g.extract(url=self.tweet_url)
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual(article.final_url, self.story_url)
+        self.assertEqual(article.title, 'The story')
+
+    def test_resolved_page_header_charset(self):
+        story = STORY_HTML.replace('The story', 'Caf\xe9 cr\xe8me')
+        with requests_mock.Mocker() as m:
+            m.get(self.tweet_url, text=TWEET_HTML)
+            m.get(self.story_url, content=story.encode('cp1252'),
+                  headers={'Content-Type': 'text/html; charset=windows-1252'})
+            with Goose() as g:
+                article = g.extract(url=self.tweet_url)
+        self.assertEqual(article.title, 'Caf\xe9 cr\xe8me')
@@ -22,7 +22,7 @@ limitations under the License.
 """
 import unittest
 
-from goose3.text import get_encodings_from_content
+from goose3.text import get_encodings_from_content, get_encoding_from_headers, strip_scripts_styles
 
 
 class TestText(unittest.TestCase):
@@ -60,3 +60,28 @@ class TestText(unittest.TestCase):
                 b'<meta http-equiv="content-type" content="text/html; charset=utf-8" />'),
             ['utf-8']
         )
+
+    def test_get_encoding_from_headers(self):
+        self.assertEqual(get_encoding_from_headers({'Content-Type': 'text/html; charset=UTF-8'}), 'UTF-8')
+        self.assertEqual(get_encoding_from_headers({'content-type': 'text/html; charset="iso-8859-15"'}),
+                         'iso-8859-15')
+        self.assertIsNone(get_encoding_from_headers({'Content-Type': 'text/html'}))
+        self.assertIsNone(get_encoding_from_headers(None))
+
+    def test_get_encodings_from_content_is_bounded(self):
+        head = '<html><head><meta charset="utf-8">'
+        filler = '<meta name="x" content="y">' * 10000
+        self.assertEqual(get_encodings_from_content(head + filler), ['utf-8'])
+        self.assertEqual(get_encodings_from_content(filler + '<meta charset="latin-1">'), [])
+        self.assertEqual(get_encodings_from_content((head + filler).encode('utf-8')), ['utf-8'])
+
+    def test_strip_scripts_styles(self):
+        html = ('<html><head><style type="text/css">p { color: red; }</style>'
+                '<script>var a = "<p>not text</p>";</script>'
+                '<script type="application/ld+json">{"@type": "NewsArticle"}</script></head>'
+                '<body><!-- a <script> in a comment --><p>Text</p><noscript><img src="a.png"></noscript>'
+                '<SVG viewBox="0 0 1 1"><title>Icon</title></SVG><script src="b.js"></script></body></html>')
+        expected = ('<html><head><script type="application/ld+json">{"@type": "NewsArticle"}</script></head>'
+                    '<body><p>Text</p></body></html>')
+        self.assertEqual(strip_scripts_styles(html), expected)
+        self.assertEqual(strip_scripts_styles(html.encode('utf-8')), expected.encode('utf-8'))
@@ -32,3 +32,7 @@ class TestArticleTweet(TestExtractionBase):
         number_tweets = len(article.tweets)
         expected_number_tweets = self.data['expected']['tweets']
         self.assertEqual(number_tweets, expected_number_tweets)
+        for tweet in article.tweets:
+            self.assertNotIn('gravity', tweet)
+        # scores are not written to the tree
+        self.assertEqual(article.top_node.xpath('descendant-or-self::*[@gravityScore or @gravityNodes]'), [])
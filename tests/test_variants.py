@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""\
+This is a python port of "Goose" orignialy licensed to Gravity.com
+under one or more contributor license agreements.  See the NOTICE file
+distributed with this work for additional information
+regarding copyright ownership.
+
+Python port was written by Xavier Grangier for Recrutae
+
+Gravity.com licenses this file
+to you under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance
+with the License.  You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import unittest
+
+import requests_mock
+
+from goose3 import Goose
+from goose3.text import HEAD_SCAN_SIZE, get_amphtml_link
+
+
+ARTICLE_TEXT = (
+    'This is the text of the article and it is long enough to be the one that is picked '
+    'up by the extractor as the main content of the page.'
+)
+
+FULL_HTML = (
+    '<html><head><title>Full page</title>'
+    '<link rel="amphtml" href="/story/amp"></head>'
+    '<body><div class="menu"><a href="/">home</a></div><p>%s</p></body></html>' % ARTICLE_TEXT
+)
+
+AMP_HTML = '<html><head><title>AMP page</title></head><body><p>%s</p></body></html>' % ARTICLE_TEXT
+
+EMPTY_HTML = '<html><head><title>Empty</title></head><body></body></html>'
+
+
+class TestLightweightVariants(unittest.TestCase):
+
+    url = 'http://example.com/story'
+
+    def test_get_amphtml_link(self):
+        self.assertEqual(get_amphtml_link(FULL_HTML), '/story/amp')
+        self.assertEqual(get_amphtml_link(FULL_HTML.encode('utf-8')), '/story/amp')
+        self.assertIsNone(get_amphtml_link(AMP_HTML))
+        # links out of the head are not considered
+        self.assertIsNone(get_amphtml_link('<head></head><body><link rel="amphtml" href="/amp"></body>'))
+        # only the start of a page without a head end is scanned
+        padding = '<meta name="x">' * (HEAD_SCAN_SIZE // 15)
+        self.assertIsNone(get_amphtml_link(padding + '<link rel="amphtml" href="/amp">'))
+        self.assertIsNone(get_amphtml_link((padding + '<link rel="amphtml" href="/amp">').encode('utf-8')))
+
+    def test_amphtml_variant(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.url, text=FULL_HTML)
+            m.get(self.url + '/amp', text=AMP_HTML)
+            with Goose({'lightweight_variants': True}) as g:
+                article = g.extract(url=self.url)
+        self.assertEqual(article.title, 'AMP page')
+        self.assertEqual(article.final_url, self.url + '/amp')
+        self.assertEqual(article.cleaned_text, ARTICLE_TEXT)
+
+    def test_amphtml_variant_disabled(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.url, text=FULL_HTML)
+            with Goose() as g:
+                article = g.extract(url=self.url)
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(article.title, 'Full page')
+
+    def test_empty_variant_falls_back(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.url, text=FULL_HTML)
+            m.get(self.url + '/amp', text=EMPTY_HTML)
+            with Goose({'lightweight_variants': True}) as g:
+                article = g.extract(url=self.url)
+        self.assertEqual(article.title, 'Full page')
+        self.assertEqual(article.cleaned_text, ARTICLE_TEXT)
+
+    def test_missing_variant_falls_back(self):
+        with requests_mock.Mocker() as m:
+            m.get(self.url, text=FULL_HTML)
+            m.get(self.url + '/amp', status_code=404, text=AMP_HTML)
+            with Goose({'lightweight_variants': True}) as g:
+                article = g.extract(url=self.url)
+        self.assertEqual(article.title, 'Full page')
+
+    def test_print_variant(self):
+        config = {
+            'lightweight_variants': True,
+            'print_variant_patterns': [(r'^(http://example\.com/.*)$', r'\1?print=1')],
+        }
+        with requests_mock.Mocker() as m:
+            m.get(self.url + '?print=1', text=AMP_HTML)
+            with Goose(config) as g:
+                article = g.extract(url=self.url)
+            # the full page is never fetched
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(article.cleaned_text, ARTICLE_TEXT)